@@ -1,8 +1,11 @@
 import logging
+import logging.handlers
+import atexit
+import copy
+import queue
 import os
 import json
 import re
-import requests
 from dotenv import load_dotenv
 import asyncpg
 from twitchio.ext import commands, eventsub
@@ -10,17 +13,78 @@ import twitchio
 import asyncio
 from typing import Optional
 import aiohttp
+import aiohttp.web
 from zoneinfo import ZoneInfo
 import time
 from datetime import datetime, timedelta, timezone
 import calendar
-from collections import defaultdict
+import cProfile
+import pstats
+import io
+import sqlite3
+from collections import defaultdict, deque, OrderedDict
+import functools
+import contextlib
+from urllib.parse import urlparse
 
 
 load_dotenv()
 
+
+class JsonFormatter(logging.Formatter):
+    """Schreibt jeden Log-Eintrag als eine JSON-Zeile, inklusive channel, command und latency_ms falls vorhanden."""
+
+    fields = ('channel', 'command', 'latency_ms', 'host', 'streamer_id', 'event', 'limiter')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in self.fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """Legt Log-Einträge nur in die Queue, geschrieben wird im Thread des QueueListeners."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+if os.getenv('log_rotate_when'):
+    log_file_handler = logging.handlers.TimedRotatingFileHandler('bot.log', when=os.getenv('log_rotate_when'),
+                                                                 backupCount=int(os.getenv('log_backup_count', 14)),
+                                                                 encoding='utf-8')
+else:
+    log_file_handler = logging.handlers.RotatingFileHandler('bot.log', maxBytes=int(os.getenv('log_max_bytes', 10 * 1024 * 1024)),
+                                                            backupCount=int(os.getenv('log_backup_count', 14)),
+                                                            encoding='utf-8')
+log_file_handler.setFormatter(JsonFormatter())
+log_console_handler = logging.StreamHandler()
+log_console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler, log_console_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.getLogger('twitchio').setLevel(logging.CRITICAL)
-logging.basicConfig(filename='bot.log', level=logging.INFO, format='%(message)s', encoding='utf-8')
+logging.basicConfig(level=logging.INFO, handlers=[StructuredQueueHandler(log_queue)])
+logger = logging.getLogger('bot')
 
 berlin_zone = ZoneInfo("Europe/Berlin")
 
@@ -37,9 +101,477 @@ esbot = commands.Bot.from_client_credentials(client_id=os.getenv('Twitch_App_ID'
                                          client_secret=os.getenv('Twitch_App_Token'))
 
 
-esclient = eventsub.EventSubClient(esbot,
-                                   webhook_secret=os.getenv('webhook_secret_pw'),
-                                   callback_route='https://eventsub.spofoh.de/callback')
+class JournalingEventSubClient(eventsub.EventSubClient):
+    """Webhook-Listener, der Stream-Events ins Journal schreibt, bevor Twitch die 200-Antwort bekommt.
+
+    twitchio plant den Event-Handler nur ein und antwortet sofort; stürzt der Bot dazwischen ab,
+    würde Twitch das Event nie erneut senden. Schlägt das Schreiben fehl, antworten wir mit 500,
+    dann stellt Twitch die Nachricht erneut zu. Überschreibt _callback aus twitchio 2.10.0 (siehe requirements.txt).
+    """
+
+    async def _callback(self, request):
+        if request.headers.get('Twitch-Eventsub-Message-Type') != 'notification':
+            return await super()._callback(request)
+
+        event = eventsub.NotificationEvent(self, await request.text(), request)
+        response = event.verify()
+        if response.status != 200:
+            return response
+
+        name = eventsub.SubscriptionTypes._name_map[event.subscription.type]
+        handler = getattr(Bot, f'event_eventsub_notification_{name}', None)
+        if handler is None:
+            self.client.run_event(f'eventsub_notification_{name}', event)
+            return response
+
+        try:
+            await handler(event)
+        except Exception:
+            logger.error(f'EventSub-Nachricht {event.headers.message_id} konnte nicht ins Journal geschrieben werden',
+                         exc_info=True, extra={'event': name})
+            return aiohttp.web.Response(status=500)
+        return response
+
+
+class EventSubSockets:
+    """Einzige Stelle, die in die Interna von twitchios EventSubWSClient greift.
+
+    Geschrieben gegen twitchio 2.10.0 (in requirements.txt gepinnt): EventSubWSClient._sockets,
+    Websocket._sock, Websocket._pump_task, Websocket._subscription_pool und Route.BASE_URL sind dort
+    nicht öffentlich. Vor einem Update von twitchio muss nur diese Klasse geprüft werden.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def sockets(self):
+        return list(self.client._sockets)
+
+    @staticmethod
+    def is_healthy(sock):
+        return sock.is_connected and sock._pump_task is not None and not sock._pump_task.done()
+
+    @staticmethod
+    async def reconnect(sock):
+        # connect() ohne reconnect_url legt alle Abonnements aus dem Pool für die neue Session wieder an.
+        if sock.is_connected:
+            await sock._sock.close()
+        await sock.connect()
+
+    def forget_broadcaster(self, broadcaster_id):
+        """Entfernt die Abonnements eines Kanals aus dem Pool, damit ein Reconnect sie nicht wieder anlegt."""
+        for sock in self.client._sockets:
+            for sub in list(sock._subscription_pool):
+                if sub.condition.get('broadcaster_user_id') == str(broadcaster_id):
+                    sock._subscription_pool.remove(sub)
+
+    def cost_exhausted(self):
+        """True, sobald Twitch max_total_cost als erreicht gemeldet hat.
+
+        twitchio legt weitere Abonnements dann auf einen neuen Socket und kehrt zurück, ohne auf die Antwort
+        zu warten; ein 429 von Twitch ginge so still verloren.
+        """
+        return bool(self.client._sockets) and all(sock.remaining_slots <= 0 for sock in self.client._sockets)
+
+    def release_cost(self, cost):
+        """Gibt die Kosten eines gelöschten Abonnements frei; max_total_cost gilt für den ganzen Token."""
+        for sock in self.client._sockets:
+            sock.remaining_slots += cost
+
+    @staticmethod
+    def subscriptions_url():
+        return f'{twitchio.http.Route.BASE_URL}/eventsub/subscriptions'
+
+
+eventsub_transport = os.getenv('eventsub_transport', 'webhook').lower()
+eventsub_ws_token = os.getenv('eventsub_ws_token')
+eventsub_ws_check_interval = 10
+
+if eventsub_transport == 'websocket':
+    # Der Chat-Token gehört in der Regel zu einer anderen App als Twitch_App_ID und wird von Twitch abgelehnt.
+    if not eventsub_ws_token:
+        raise RuntimeError('eventsub_transport=websocket braucht eventsub_ws_token (User-Token der App aus Twitch_App_ID)')
+    if os.getenv('eventsub_ws_url'):
+        eventsub.Websocket.URL = os.getenv('eventsub_ws_url')
+    esclient = eventsub.EventSubWSClient(esbot)
+    eventsub_sockets = EventSubSockets(esclient)
+else:
+    esclient = JournalingEventSubClient(esbot,
+                                        webhook_secret=os.getenv('webhook_secret_pw'),
+                                        callback_route='https://eventsub.spofoh.de/callback')
+    eventsub_sockets = None
+
+
+def eventsub_ws_headers():
+    return {'Authorization': f'Bearer {eventsub_ws_token}', 'Client-Id': os.getenv('Twitch_App_ID')}
+
+
+class StreamEventJournal:
+    """Lokales Write-Behind-Journal (SQLite) für EventSub-Events (stream.online, stream.offline, channel.update).
+
+    Events werden hier dauerhaft gespeichert und später in Eingangsreihenfolge gesammelt nach Postgres geschrieben.
+    Beim Webhook-Transport passiert das vor der Bestätigung an Twitch (siehe JournalingEventSubClient);
+    der WebSocket-Transport kennt keine Bestätigung, dort geht ein Event bei einem Absturz vor dem Schreiben verloren.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = asyncio.Lock()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''CREATE TABLE IF NOT EXISTS stream_event_journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_type TEXT NOT NULL,
+                    event_id TEXT NOT NULL UNIQUE,
+                    streamer_id INTEGER NOT NULL,
+                    streamer_name TEXT NOT NULL,
+                    occurred_at TEXT NOT NULL,
+                    payload TEXT NOT NULL DEFAULT '{}',
+                    received_at REAL NOT NULL,
+                    flushed_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    failed_at REAL,
+                    last_error TEXT
+                )''')
+            db.execute('''CREATE INDEX IF NOT EXISTS stream_event_journal_pending
+                    ON stream_event_journal (id) WHERE flushed_at IS NULL''')
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute('PRAGMA synchronous=FULL')
+        return db
+
+    def _append(self, event_type, event_id, streamer_id, streamer_name, occurred_at, payload):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO stream_event_journal "
+                "(event_type, event_id, streamer_id, streamer_name, occurred_at, payload, received_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (event_type, event_id, streamer_id, streamer_name, occurred_at.isoformat(), json.dumps(payload), time.time())
+            )
+
+    def _pending(self, limit):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, event_type, event_id, streamer_id, streamer_name, occurred_at, payload FROM stream_event_journal "
+                "WHERE flushed_at IS NULL AND failed_at IS NULL ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [(journal_id, event_type, event_id, streamer_id, streamer_name, datetime.fromisoformat(occurred_at), json.loads(payload))
+                for journal_id, event_type, event_id, streamer_id, streamer_name, occurred_at, payload in rows]
+
+    def _mark_flushed(self, ids):
+        now = time.time()
+        with self._connect() as db:
+            db.executemany("UPDATE stream_event_journal SET flushed_at = ? WHERE id = ?", [(now, i) for i in ids])
+            db.execute("DELETE FROM stream_event_journal WHERE flushed_at < ?", (now - journal_retention_seconds,))
+
+    def _record_failure(self, journal_id, error):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE stream_event_journal SET attempts = attempts + 1, last_error = ?, "
+                "failed_at = CASE WHEN attempts + 1 >= ? THEN ? END WHERE id = ?",
+                (repr(error), journal_max_attempts, time.time(), journal_id)
+            )
+            attempts, failed_at = db.execute(
+                "SELECT attempts, failed_at FROM stream_event_journal WHERE id = ?", (journal_id,)
+            ).fetchone()
+        return attempts, failed_at is not None
+
+    def _lag(self):
+        with self._connect() as db:
+            pending, oldest = db.execute(
+                "SELECT COUNT(*), MIN(received_at) FROM stream_event_journal WHERE flushed_at IS NULL AND failed_at IS NULL"
+            ).fetchone()
+            failed = db.execute("SELECT COUNT(*) FROM stream_event_journal WHERE failed_at IS NOT NULL").fetchone()[0]
+        return pending, (time.time() - oldest) if oldest else 0.0, failed
+
+    async def append(self, event_type, event_id, streamer_id, streamer_name, occurred_at, payload=None):
+        async with self.lock:
+            await asyncio.to_thread(self._append, event_type, event_id, streamer_id, streamer_name, occurred_at, payload or {})
+        journal_wakeup.set()
+
+    async def pending(self, limit):
+        async with self.lock:
+            return await asyncio.to_thread(self._pending, limit)
+
+    async def mark_flushed(self, ids):
+        async with self.lock:
+            await asyncio.to_thread(self._mark_flushed, ids)
+
+    async def record_failure(self, journal_id, error):
+        """Zählt einen fehlgeschlagenen Versuch; nach journal_max_attempts wird das Event in Quarantäne gestellt.
+
+        Gibt (Anzahl Versuche, in Quarantäne) zurück.
+        """
+        async with self.lock:
+            return await asyncio.to_thread(self._record_failure, journal_id, error)
+
+    async def lag(self):
+        """Gibt (offene Events, Alter des ältesten offenen Events in Sekunden, Events in Quarantäne) zurück."""
+        async with self.lock:
+            return await asyncio.to_thread(self._lag)
+
+
+journal_batch_size = int(os.getenv('journal_batch_size', 50))
+journal_retention_seconds = 7 * 24 * 3600
+journal_max_attempts = int(os.getenv('journal_max_attempts', 10))
+channel_lookup_timeout = 5
+# Fehler, bei denen Postgres nicht erreichbar ist; sie zählen nicht als fehlgeschlagener Versuch eines Events.
+journal_connection_errors = (OSError, asyncio.TimeoutError, asyncpg.InterfaceError,
+                             asyncpg.PostgresConnectionError, asyncpg.exceptions.OperatorInterventionError)
+stream_event_journal = StreamEventJournal(os.getenv('journal_path', 'stream_journal.sqlite3'))
+journal_wakeup = asyncio.Event()
+profile_lock = asyncio.Lock()
+profile_max_seconds = 120
+profile_dir = os.getenv('profile_dir', 'profiles')
+# Zeit, die der Event-Loop nur auf I/O wartet
+profile_idle_functions = ("<method 'poll' of 'select.epoll' objects>", "<method 'select' of 'select.epoll' objects>",
+                          "<method 'control' of 'select.kqueue' objects>", "<built-in method select.select>")
+sullygnome_backfill = os.getenv('sullygnome_backfill', 'true').lower() == 'true'
+
+
+class UpstreamUnavailable(Exception):
+    """Wird geworfen, wenn der Circuit Breaker eines Hosts offen ist oder die Anfrage fehlschlägt."""
+
+    def __init__(self, host, reason):
+        super().__init__(f'{host}: {reason}')
+        self.host = host
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Merkt sich den Zustand eines externen Hosts und lässt Anfragen schnell fehlschlagen, solange er offen ist."""
+
+    def __init__(self, host):
+        self.host = host
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.latency = None
+
+    def allow(self):
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at < breaker_reset_seconds:
+                return False
+            self.state = 'half_open'
+        if self.state == 'half_open':
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def deadline(self):
+        if self.latency is None:
+            return upstream_max_deadline
+        return max(upstream_min_deadline, min(upstream_max_deadline, self.latency * 4))
+
+    def record_success(self, latency):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self.failures = 0
+        self.state = 'closed'
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == 'half_open' or self.failures >= breaker_failure_threshold:
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+
+breaker_failure_threshold = 5
+breaker_reset_seconds = 30
+upstream_min_deadline = 2
+upstream_max_deadline = 15
+logs_reply_budget = float(os.getenv('logs_reply_budget', 0))
+background_tasks = set()
+circuit_breakers = {}
+
+
+def get_breaker(url):
+    host = urlparse(url).netloc
+    if host not in circuit_breakers:
+        circuit_breakers[host] = CircuitBreaker(host)
+    return circuit_breakers[host]
+
+
+async def upstream_request(method, url, session=None, **kwargs):
+    """Anfrage an einen externen Dienst mit Circuit Breaker und latenzabhängiger Deadline.
+
+    Gibt (Statuscode, Antworttext) zurück.
+    """
+    breaker = get_breaker(url)
+    if not breaker.allow():
+        raise UpstreamUnavailable(breaker.host, 'circuit open')
+
+    start = time.monotonic()
+    try:
+        timeout = aiohttp.ClientTimeout(total=breaker.deadline())
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                async with own_session.request(method, url, timeout=timeout, **kwargs) as response:
+                    status, body = response.status, await response.text()
+        else:
+            async with session.request(method, url, timeout=timeout, **kwargs) as response:
+                status, body = response.status, await response.text()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Auch kaputte Antworten (z.B. UnicodeDecodeError beim Dekodieren) zählen als Fehler des Hosts.
+        breaker.record_failure()
+        raise UpstreamUnavailable(breaker.host, str(e) or type(e).__name__) from e
+    finally:
+        # Sonst bliebe ein halb offener Breaker nach einer abgebrochenen Probe für immer zu.
+        breaker.probe_in_flight = False
+
+    if status >= 500:
+        breaker.record_failure()
+        raise UpstreamUnavailable(breaker.host, f'Statuscode {status}')
+    breaker.record_success(time.monotonic() - start)
+    return status, body
+
+class CommandLimiter:
+    """Globale Obergrenze für gleichzeitig laufende teure Commands einer Klasse.
+
+    Wartende werden pro Channel im Round-Robin bedient, Admin und Mods haben eine eigene, bevorzugte Warteschlange.
+    Wäre die geschätzte oder tatsächliche Wartezeit länger als limiter_max_wait, wird die Anfrage abgewiesen.
+    """
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.lanes = {True: OrderedDict(), False: OrderedDict()}
+        self.service_time = None
+        self.admitted = 0
+        self.shed = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def queued(self, priority=None):
+        lanes = [self.lanes[priority]] if priority is not None else self.lanes.values()
+        return sum(len(waiters) for lane in lanes for waiters in lane.values())
+
+    def estimated_wait(self, priority):
+        ahead = self.queued(True) if priority else self.queued()
+        return (ahead + 1) / self.limit * (self.service_time or 0.0)
+
+    async def acquire(self, channel, priority):
+        if self.active < self.limit and not self.queued():
+            self.active += 1
+            self.admitted += 1
+            return True
+        if self.estimated_wait(priority) > limiter_max_wait:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane = self.lanes[priority]
+        lane.setdefault(channel, deque()).append(waiter)
+        start = time.monotonic()
+        # asyncio.wait statt wait_for: wait_for verschluckt einen Abbruch, wenn der Platz im selben Moment vergeben wurde.
+        try:
+            await asyncio.wait((waiter,), timeout=limiter_max_wait)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # Der Platz wurde gerade noch vergeben.
+                self._release_slot()
+            else:
+                self._forget_waiter(lane, channel, waiter)
+            raise
+        if not waiter.done():
+            self._forget_waiter(lane, channel, waiter)
+            self.shed += 1
+            return False
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return True
+
+    @staticmethod
+    def _forget_waiter(lane, channel, waiter):
+        waiter.cancel()
+        lane[channel].remove(waiter)
+        if not lane[channel]:
+            del lane[channel]
+
+    def release(self, service_time):
+        self.service_time = service_time if self.service_time is None else 0.8 * self.service_time + 0.2 * service_time
+        self._release_slot()
+
+    def _release_slot(self):
+        self.active -= 1
+        while self.active < self.limit:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.active += 1
+            waiter.set_result(True)
+
+    def _next_waiter(self):
+        for priority in (True, False):
+            lane = self.lanes[priority]
+            if lane:
+                channel, waiters = lane.popitem(last=False)
+                waiter = waiters.popleft()
+                if waiters:
+                    lane[channel] = waiters
+                return waiter
+        return None
+
+    def stats(self):
+        return {
+            'limiter': self.name, 'limit': self.limit, 'active': self.active, 'queued': self.queued(),
+            'admitted': self.admitted, 'shed': self.shed, 'max_wait_s': round(self.max_wait, 3),
+            'avg_wait_s': round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            'service_time_s': round(self.service_time, 3) if self.service_time is not None else None,
+        }
+
+
+limiter_max_wait = float(os.getenv('limiter_max_wait', 5))
+limiter_stats_interval = 60
+command_limiters = {
+    'sullygnome': CommandLimiter('sullygnome', int(os.getenv('limit_sullygnome', 4))),
+    'logs': CommandLimiter('logs', int(os.getenv('limit_logs', 8))),
+}
+
+
+@contextlib.asynccontextmanager
+async def command_slot(ctx, command_class):
+    """Hält einen Platz im CommandLimiter der angegebenen Klasse.
+
+    Liefert False, wenn die Anfrage abgewiesen wurde; der Nutzer hat dann schon eine Antwort bekommen.
+    """
+    limiter = command_limiters[command_class]
+    author = ctx.author.name.lower()
+    priority = author == os.getenv('Bot_Admin') or getattr(ctx.author, 'is_mod', False)
+    if not await limiter.acquire(ctx.channel.name, priority):
+        logger.warning(f'Anfrage abgewiesen, {limiter.name} ausgelastet',
+                       extra={'channel': ctx.channel.name, 'command': ctx.command.name, 'event': 'load_shed'})
+        await ctx.reply("/me ⚠️ Der Bot ist gerade ausgelastet, bitte versuche es gleich nochmal. ⚠️")
+        yield False
+        return
+    start = time.monotonic()
+    try:
+        yield True
+    finally:
+        limiter.release(time.monotonic() - start)
+
+
+def limited(command_class):
+    """Begrenzt einen Command über den CommandLimiter der angegebenen Klasse."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, ctx, *args, **kwargs):
+            async with command_slot(ctx, command_class) as admitted:
+                if admitted:
+                    return await func(self, ctx, *args, **kwargs)
+        return wrapper
+    return decorator
+
 
 class Bot(commands.Bot):
 
@@ -51,56 +583,75 @@ class Bot(commands.Bot):
             channels = json.load(f)
         super().__init__(token=os.getenv('Twitch_Generator_Token'), client_id=os.getenv('Twitch_Generator_ID'), prefix='+',
                          initial_channels=channels)
+        self.database_tables_ready = False
         
     async def __ainit__(self) -> None:
-        await esclient.delete_all_active_subscriptions()
         with open('channels.json', 'r') as f:
             channels = json.load(f)
-        self.loop.create_task(esclient.listen(port=4000))
+        if eventsub_transport == 'websocket':
+            self.loop.create_task(self.supervise_eventsub_websocket())
+        else:
+            await esclient.delete_all_active_subscriptions()
+            self.loop.create_task(esclient.listen(port=4000))
 
         broadcaster_id = await self.fetch_users(names=channels,  token = os.getenv('Twitch_Generator_Token'))
         for broad_id in broadcaster_id:
-            try:
-                await esclient.subscribe_channel_stream_start(broadcaster=broad_id.id)
-            except twitchio.HTTPException:
-                pass
+            await self.subscribe_stream_events(broad_id.id)
 
     async def search_logs(self, channel_name, username=None):
         available_logs = []
 
-        async with aiohttp.ClientSession() as session:
-            tasks = []
+        session = aiohttp.ClientSession()
+        tasks = []
+        try:
             for site in log_sites:
-                tasks.append(self.fetch_logs(session, site, channel_name, username))
+                tasks.append(asyncio.create_task(self.fetch_logs(session, site, channel_name, username)))
+
+            done, _ = await asyncio.wait(tasks, timeout=logs_reply_budget or None)
+        finally:
+            # Nicht abbrechen: Erst wenn die Anfrage endet oder in ihre Deadline läuft, merkt sich der
+            # Circuit Breaker, dass eine Instanz nicht antwortet. Ein Abbruch wäre für ihn unsichtbar.
+            unfinished = [task for task in tasks if not task.done()]
+            if unfinished:
+                background = asyncio.create_task(self.finish_log_lookups(session, unfinished))
+                background_tasks.add(background)
+                background.add_done_callback(background_tasks.discard)
+            else:
+                await session.close()
 
-            results = await asyncio.gather(*tasks)
-            for result in results:
-                if result:
-                    available_logs.append(result)
+        for task in tasks:
+            if task in done and task.result():
+                available_logs.append(task.result())
 
         return available_logs
+
+    async def finish_log_lookups(self, session, tasks):
+        try:
+            await asyncio.wait(tasks)
+        finally:
+            await session.close()
     
     async def fetch_logs(self, session, site, channel_name, username):
         try:
-            async with session.get(f'{site}/channels') as response:
-                if response.status == 200:
-                    try:
-                        data = await response.json()
-                        channels = [channel['name'] for channel in data['channels']]
-
-                        if channel_name.lower() in channels:
-                            url = f'{site}/?channel={channel_name}'
-
-                            if username:
-                                url += f'&username={username}'
-                        
-                            return url
-                    except aiohttp.ContentTypeError:
-                        print(f'Warnung: Die Antwort von {site}/channels konnte nicht als JSON interpretiert werden.')
-                else:
-                    print(f'Warnung: Anfrage an {site}/channels hat den Statuscode {response.status} zurückgegeben.')
-        except aiohttp.ClientError as e:
-            print(f'Warnung: Anfrage an {site} fehlgeschlagen. Fehlermeldung: {str(e)}')
+            status, body = await upstream_request('GET', f'{site}/channels', session=session)
+            if status == 200:
+                try:
+                    data = json.loads(body)
+                    channels = [channel['name'] for channel in data['channels']]
+
+                    if channel_name.lower() in channels:
+                        url = f'{site}/?channel={channel_name}'
+
+                        if username:
+                            url += f'&username={username}'
+                    
+                        return url
+                except json.JSONDecodeError:
+                    logger.warning(f'Die Antwort von {site}/channels konnte nicht als JSON interpretiert werden.', extra={'host': site, 'channel': channel_name})
+            else:
+                logger.warning(f'Anfrage an {site}/channels hat den Statuscode {status} zurückgegeben.', extra={'host': site, 'channel': channel_name})
+        except UpstreamUnavailable as e:
+            logger.warning(f'Anfrage an {site} fehlgeschlagen. Fehlermeldung: {e.reason}', extra={'host': site, 'channel': channel_name})
 
         return None
 
@@ -111,8 +662,8 @@ class Bot(commands.Bot):
             'client-id': 'kimne78kx3ncx6brgo4mv6wki5h1ko',
             'Content-Type': 'text/plain'
         }
-        response = requests.request("POST", url, headers=headers, data=payload)
-        data = json.loads(response.text)
+        status, body = await upstream_request("POST", url, headers=headers, data=payload)
+        data = json.loads(body)
         if data and 'data' in data[0] and 'user' in data[0]['data'] and 'mods' in data[0]['data']['user'] and 'edges' in data[0]['data']['user']['mods']:
             mods = [edge['node']['login'] for edge in data[0]['data']['user']['mods']['edges']]
         else:
@@ -123,54 +674,88 @@ class Bot(commands.Bot):
     async def create_database_tables(self):
         conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
                                     user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                    database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS twitch_channels (
-                channel_id INTEGER PRIMARY KEY,
-                watch_time INTEGER
-            );
-        ''')
-
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS channel_offdays_stats (
-                id SERIAL PRIMARY KEY,
-                channel_id INT NOT NULL,
-                year INT NOT NULL,
-                month INT NOT NULL,
-                live_days INT DEFAULT 0,
-                UNIQUE (channel_id, year, month)
-            )
-        """)
-
-        await conn.execute('''CREATE TABLE IF NOT EXISTS streaks (
-                streamer_id INTEGER PRIMARY KEY,
-                current_streak INTEGER,
-                highest_streak INTEGER,
-                last_live_date TEXT
-            )''')
-        
-        await conn.execute('''CREATE TABLE IF NOT EXISTS live_channels_today (
-                streamer_id INTEGER PRIMARY KEY,
-                last_live_date TEXT
-            )''')
+                                    database=os.getenv('db_database'), timeout=10)
+        try:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS twitch_channels (
+                    channel_id INTEGER PRIMARY KEY,
+                    watch_time INTEGER
+                );
+            ''')
+
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS channel_offdays_stats (
+                    id SERIAL PRIMARY KEY,
+                    channel_id INT NOT NULL,
+                    year INT NOT NULL,
+                    month INT NOT NULL,
+                    live_days INT DEFAULT 0,
+                    UNIQUE (channel_id, year, month)
+                )
+            """)
 
-        await conn.close()
+            await conn.execute('''CREATE TABLE IF NOT EXISTS streaks (
+                    streamer_id INTEGER PRIMARY KEY,
+                    current_streak INTEGER,
+                    highest_streak INTEGER,
+                    last_live_date TEXT
+                )''')
+
+            await conn.execute('''CREATE TABLE IF NOT EXISTS live_channels_today (
+                    streamer_id INTEGER PRIMARY KEY,
+                    last_live_date TEXT
+                )''')
+
+            await conn.execute('''CREATE TABLE IF NOT EXISTS stream_events_applied (
+                    event_id TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ DEFAULT now()
+                )''')
+            await conn.execute('''CREATE INDEX IF NOT EXISTS stream_events_applied_applied_at
+                    ON stream_events_applied (applied_at)''')
+
+            await conn.execute('''CREATE TABLE IF NOT EXISTS stream_sessions (
+                    id BIGSERIAL PRIMARY KEY,
+                    channel_id BIGINT NOT NULL,
+                    stream_id TEXT NOT NULL UNIQUE,
+                    started_at TIMESTAMPTZ NOT NULL,
+                    ended_at TIMESTAMPTZ
+                )''')
+            await conn.execute('''CREATE INDEX IF NOT EXISTS stream_sessions_channel_started
+                    ON stream_sessions (channel_id, started_at)''')
+            await conn.execute('''CREATE INDEX IF NOT EXISTS stream_sessions_open
+                    ON stream_sessions (channel_id) WHERE ended_at IS NULL''')
+
+            await conn.execute('''CREATE TABLE IF NOT EXISTS stream_game_segments (
+                    id BIGSERIAL PRIMARY KEY,
+                    session_id BIGINT NOT NULL REFERENCES stream_sessions (id) ON DELETE CASCADE,
+                    channel_id BIGINT NOT NULL,
+                    category_id TEXT,
+                    category_name TEXT,
+                    started_at TIMESTAMPTZ NOT NULL,
+                    ended_at TIMESTAMPTZ
+                )''')
+            await conn.execute('''CREATE INDEX IF NOT EXISTS stream_game_segments_channel_started
+                    ON stream_game_segments (channel_id, started_at)''')
+            await conn.execute('''CREATE INDEX IF NOT EXISTS stream_game_segments_open
+                    ON stream_game_segments (channel_id) WHERE ended_at IS NULL''')
+
+            await conn.execute('''CREATE TABLE IF NOT EXISTS channel_state (
+                    channel_id BIGINT PRIMARY KEY,
+                    category_id TEXT,
+                    category_name TEXT,
+                    title TEXT,
+                    updated_at TIMESTAMPTZ NOT NULL
+                )''')
+        finally:
+            await conn.close()
 
-    async def update_live_days(self, channel_name):
-        today = datetime.now(berlin_zone).date()
+    async def update_live_days(self, conn, streamer_id, today):
         month = today.month
         year = today.year
 
-        conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
-                                    user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                    database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        streamer_twitch_id = await self.fetch_users(names=[channel_name])
-
         result = await conn.fetchrow(
     "SELECT id, live_days FROM channel_offdays_stats WHERE channel_id=$1 AND month=$2 AND year=$3",
-    streamer_twitch_id[0].id, month, year
+    streamer_id, month, year
 )
 
         if result:
@@ -182,29 +767,17 @@ class Bot(commands.Bot):
         else:
             await conn.execute(
                 "INSERT INTO channel_offdays_stats (channel_id, month, year, live_days) VALUES ($1, $2, $3, 1)",
-                streamer_twitch_id[0].id, month, year
+                streamer_id, month, year
             )
 
-
-        await conn.close()
-
-    async def update_streak(self, streamer_name):
-        today = datetime.now(berlin_zone).date()
-            
-        conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
-                                    user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                    database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        streamer_twitch_id = await self.fetch_users(names=[streamer_name])
-        streamer_id = streamer_twitch_id[0].id
-        
+    async def update_streak(self, conn, streamer_id, today):
         row = await conn.fetchrow("SELECT current_streak, highest_streak, last_live_date FROM streaks WHERE streamer_id = $1", (streamer_id))
 
         if row:
             current_streak, highest_streak, last_live_date = row
             last_live_date = datetime.strptime(last_live_date, '%Y-%m-%d').date()
 
-            if last_live_date == today:
+            if last_live_date >= today:
                 return
 
             if last_live_date == today - timedelta(days=1):
@@ -215,11 +788,11 @@ class Bot(commands.Bot):
             if current_streak > highest_streak:
                 highest_streak = current_streak
 
-            await conn.execute(f"""
+            await conn.execute("""
                 UPDATE streaks 
-                SET current_streak={current_streak}, highest_streak={highest_streak}, last_live_date='{str(today)}' 
-                WHERE streamer_id={streamer_id}
-            """)
+                SET current_streak=$1, highest_streak=$2, last_live_date=$3 
+                WHERE streamer_id=$4
+            """, current_streak, highest_streak, str(today), streamer_id)
         else:
             await conn.execute(
                 '''INSERT INTO streaks (streamer_id, current_streak, highest_streak, last_live_date) 
@@ -227,8 +800,6 @@ class Bot(commands.Bot):
                 streamer_id, 1, 1, str(today)
             )
 
-        await conn.close()
-
     async def reset_streaks(self):
         today = datetime.now(berlin_zone).date()
         yesterday = today - timedelta(days=1)
@@ -253,79 +824,425 @@ class Bot(commands.Bot):
 
     @esbot.event()
     async def event_eventsub_notification_stream_start(event: eventsub.StreamOnlineData) -> None:
-        print(f'Stream gestartet: {event.data.broadcaster.name}')
-        channel_name = event.data.broadcaster.name
-        await bot.update_streak(channel_name)
+        logger.info(f'Stream gestartet: {event.data.broadcaster.name}',
+                    extra={'event': 'stream_start', 'channel': event.data.broadcaster.name, 'streamer_id': event.data.broadcaster.id})
+        await stream_event_journal.append('stream_start', event.data.id, event.data.broadcaster.id,
+                                          event.data.broadcaster.name, event.data.started_at)
 
-        today = datetime.now(berlin_zone).date()
-        last_stream_date = await bot.get_last_stream_date(channel_name)
-        
-        if last_stream_date is None:
-            await bot.create_new_streamer_entry(channel_name, today)
-        else:
-            if str(last_stream_date) == str(today):
+    @esbot.event()
+    async def event_eventsub_notification_stream_end(event: eventsub.StreamOfflineData) -> None:
+        logger.info(f'Stream beendet: {event.data.broadcaster.name}',
+                    extra={'event': 'stream_end', 'channel': event.data.broadcaster.name, 'streamer_id': event.data.broadcaster.id})
+        # stream.offline hat keine eigene ID, die Message-ID bleibt aber bei erneuter Zustellung gleich.
+        await stream_event_journal.append('stream_end', f'stream_end:{event.headers.message_id}',
+                                          event.data.broadcaster.id, event.data.broadcaster.name, datetime.now(timezone.utc))
+
+    @esbot.event()
+    async def event_eventsub_notification_channel_update(event: eventsub.ChannelUpdateData) -> None:
+        logger.info(f'Kanal aktualisiert: {event.data.broadcaster.name} -> {event.data.category_name}',
+                    extra={'event': 'channel_update', 'channel': event.data.broadcaster.name, 'streamer_id': event.data.broadcaster.id})
+        await stream_event_journal.append('channel_update', f'channel_update:{event.headers.message_id}',
+                                          event.data.broadcaster.id, event.data.broadcaster.name, datetime.now(timezone.utc),
+                                          {'category_id': event.data.category_id, 'category_name': event.data.category_name,
+                                           'title': event.data.title})
+
+    async def subscribe_stream_events(self, broadcaster_id):
+        """Abonniert stream.online, stream.offline und channel.update. Gibt False zurück, wenn eines davon fehlschlug.
+
+        Jedes Abonnement wird einzeln versucht und jeder Fehler geloggt, damit ein Kanal nicht still halb oder gar
+        nicht abonniert bleibt. Beim WebSocket-Transport passiert das z.B., sobald max_total_cost (10) erreicht ist.
+        """
+        kwargs = {'token': eventsub_ws_token} if eventsub_transport == 'websocket' else {}
+        subscribed = True
+        for subscription_type, subscribe in (('stream.online', esclient.subscribe_channel_stream_start),
+                                             ('stream.offline', esclient.subscribe_channel_stream_end),
+                                             ('channel.update', esclient.subscribe_channel_update)):
+            try:
+                if eventsub_transport == 'websocket' and eventsub_sockets.cost_exhausted():
+                    raise RuntimeError('max_total_cost des eventsub_ws_token erreicht')
+                await subscribe(broadcaster=broadcaster_id, **kwargs)
+            except Exception as e:
+                subscribed = False
+                logger.error(f'EventSub-Abonnement {subscription_type} für {broadcaster_id} fehlgeschlagen. Fehlermeldung: {str(e)}',
+                             extra={'event': 'eventsub_subscribe', 'streamer_id': broadcaster_id})
+        return subscribed
+
+    async def get_stream_subscriptions(self, user_id=None):
+        if eventsub_transport != 'websocket':
+            return await esclient.get_subscriptions(user_id=user_id)
+
+        # WebSocket-Abonnements gehören zum User-Token und sind mit dem App-Token nicht sichtbar.
+        url = eventsub_sockets.subscriptions_url()
+        if user_id:
+            url += f'?user_id={user_id}'
+        status, body = await upstream_request('GET', url, headers=eventsub_ws_headers())
+        return [eventsub.Subscription(data) for data in json.loads(body).get('data', [])
+                if data['transport']['method'] == 'websocket']
+
+    async def unsubscribe_stream_events(self, broadcaster_id):
+        if eventsub_transport == 'websocket':
+            eventsub_sockets.forget_broadcaster(broadcaster_id)
+
+        subscriptions = await self.get_stream_subscriptions(user_id=broadcaster_id)
+        for subscription in subscriptions:
+            if eventsub_transport == 'websocket':
+                await upstream_request('DELETE', f'{eventsub_sockets.subscriptions_url()}?id={subscription.id}',
+                                       headers=eventsub_ws_headers())
+                eventsub_sockets.release_cost(subscription.cost)
+            else:
+                await esclient.delete_subscription(subscription_id=subscription.id)
+
+    async def supervise_eventsub_websocket(self):
+        """Baut getrennte EventSub-WebSockets neu auf, falls twitchio den Reconnect nicht selbst geschafft hat.
+
+        Keepalive-Timeouts und session_reconnect behandelt twitchio selbst. Schlägt dabei der neue Verbindungsaufbau
+        fehl oder stirbt der Empfangs-Task, bleibt der Socket tot; ein frischer connect() abonniert alle Events neu.
+        """
+        unhealthy = set()
+        while True:
+            await asyncio.sleep(eventsub_ws_check_interval)
+            for sock in eventsub_sockets.sockets():
+                if eventsub_sockets.is_healthy(sock):
+                    unhealthy.discard(sock)
+                    continue
+
+                # Erst beim zweiten Check eingreifen, damit ein laufender Reconnect von twitchio nicht doppelt ausgeführt wird.
+                if sock not in unhealthy:
+                    unhealthy.add(sock)
+                    continue
+                unhealthy.discard(sock)
+
+                logger.warning('EventSub-WebSocket getrennt, verbinde neu', extra={'event': 'eventsub_ws_reconnect'})
+                try:
+                    await eventsub_sockets.reconnect(sock)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    logger.warning(f'EventSub-WebSocket konnte nicht verbunden werden. Fehlermeldung: {str(e)}',
+                                   extra={'event': 'eventsub_ws_reconnect'})
+
+    async def apply_stream_start(self, conn, event_id, streamer_id, streamer_name, started_at):
+        today = started_at.astimezone(berlin_zone).date()
+        category = await conn.fetchrow("SELECT category_id, category_name FROM channel_state WHERE channel_id = $1", streamer_id)
+        if category is None:
+            try:
+                # twitchios eigene Session wartet bis zu 300s; das würde das ganze Journal aufhalten.
+                channel_info = await asyncio.wait_for(self.fetch_channel(str(streamer_id)), timeout=channel_lookup_timeout)
+                category = (channel_info.game_id or None, channel_info.game_name or None)
+            except Exception as e:
+                # Ohne Kategorie geht es trotzdem weiter, sonst würde das Event bei jedem Twitch-Fehler in Quarantäne landen.
+                logger.warning(f'Kategorie für {streamer_name} nicht abrufbar: {str(e)}',
+                               extra={'event': 'stream_start', 'channel': streamer_name, 'streamer_id': streamer_id})
+                category = (None, None)
+
+        async with conn.transaction():
+            first_delivery = await conn.fetchval(
+                "INSERT INTO stream_events_applied (event_id) VALUES ($1) ON CONFLICT DO NOTHING RETURNING true",
+                event_id
+            )
+            if not first_delivery:
                 return
+
+            await self.open_stream_session(conn, event_id, streamer_id, started_at, *category)
+
+            await self.update_streak(conn, streamer_id, today)
+
+            last_stream_date = await self.get_last_stream_date(conn, streamer_id)
+
+            if last_stream_date is None:
+                await self.create_new_streamer_entry(conn, streamer_id, today)
             else:
-                await bot.update_last_stream_date(channel_name, today)
-                await bot.update_live_days(channel_name)
+                if str(last_stream_date) >= str(today):
+                    return
+                else:
+                    await self.update_last_stream_date(conn, streamer_id, today)
+                    await self.update_live_days(conn, streamer_id, today)
+
+    async def open_stream_session(self, conn, stream_id, streamer_id, started_at, category_id, category_name):
+        # Sessions ohne stream.offline (z.B. verpasstes Event) werden ohne Dauer geschlossen.
+        await conn.execute(
+            "UPDATE stream_game_segments SET ended_at = started_at WHERE channel_id = $1 AND ended_at IS NULL", streamer_id
+        )
+        await conn.execute(
+            "UPDATE stream_sessions SET ended_at = started_at WHERE channel_id = $1 AND ended_at IS NULL", streamer_id
+        )
+        session_id = await conn.fetchval(
+            "INSERT INTO stream_sessions (channel_id, stream_id, started_at) VALUES ($1, $2, $3) "
+            "ON CONFLICT (stream_id) DO NOTHING RETURNING id",
+            streamer_id, stream_id, started_at
+        )
+        if session_id is not None:
+            await conn.execute(
+                "INSERT INTO stream_game_segments (session_id, channel_id, category_id, category_name, started_at) "
+                "VALUES ($1, $2, $3, $4, $5)",
+                session_id, streamer_id, category_id, category_name, started_at
+            )
+
+    async def apply_stream_end(self, conn, event_id, streamer_id, ended_at):
+        async with conn.transaction():
+            first_delivery = await conn.fetchval(
+                "INSERT INTO stream_events_applied (event_id) VALUES ($1) ON CONFLICT DO NOTHING RETURNING true",
+                event_id
+            )
+            if not first_delivery:
+                return
+
+            await conn.execute(
+                "UPDATE stream_game_segments SET ended_at = $2 WHERE channel_id = $1 AND ended_at IS NULL", streamer_id, ended_at
+            )
+            await conn.execute(
+                "UPDATE stream_sessions SET ended_at = $2 WHERE channel_id = $1 AND ended_at IS NULL", streamer_id, ended_at
+            )
+
+    async def apply_channel_update(self, conn, event_id, streamer_id, updated_at, payload):
+        async with conn.transaction():
+            first_delivery = await conn.fetchval(
+                "INSERT INTO stream_events_applied (event_id) VALUES ($1) ON CONFLICT DO NOTHING RETURNING true",
+                event_id
+            )
+            if not first_delivery:
+                return
+
+            await conn.execute('''
+                INSERT INTO channel_state (channel_id, category_id, category_name, title, updated_at) VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (channel_id) DO UPDATE SET category_id = $2, category_name = $3, title = $4, updated_at = $5
+            ''', streamer_id, payload['category_id'] or None, payload['category_name'] or None, payload['title'], updated_at)
+
+            segment = await conn.fetchrow(
+                "SELECT id, session_id, category_id FROM stream_game_segments WHERE channel_id = $1 AND ended_at IS NULL",
+                streamer_id
+            )
+            if segment is None or segment['category_id'] == (payload['category_id'] or None):
+                return
+
+            await conn.execute("UPDATE stream_game_segments SET ended_at = $2 WHERE id = $1", segment['id'], updated_at)
+            await conn.execute(
+                "INSERT INTO stream_game_segments (session_id, channel_id, category_id, category_name, started_at) "
+                "VALUES ($1, $2, $3, $4, $5)",
+                segment['session_id'], streamer_id, payload['category_id'] or None, payload['category_name'] or None, updated_at
+            )
+
+    async def flush_stream_event_journal(self):
+        retry_delay = 1
+        while True:
+            try:
+                # Tabellen werden hier statt beim Start angelegt, damit der Bot auch ohne erreichbares Postgres hochkommt.
+                if not self.database_tables_ready:
+                    await self.create_database_tables()
+                    self.database_tables_ready = True
+                    logger.info('Datenbanktabellen bereit', extra={'event': 'journal_flush'})
+                flushed_all = await self.flush_stream_event_batch()
+            except Exception as e:
+                # Der Flusher darf nie sterben, sonst bleibt das Journal still liegen.
+                flushed_all = False
+                logger.warning(f'Journal konnte nicht nach Postgres geschrieben werden, neuer Versuch in {retry_delay}s. Fehlermeldung: {str(e)}',
+                               exc_info=not isinstance(e, journal_connection_errors), extra={'event': 'journal_flush'})
+
+            if flushed_all:
+                retry_delay = 1
+                continue
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 60)
+
+    async def flush_stream_event_batch(self):
+        """Schreibt einen Batch aus dem Journal nach Postgres. Gibt False zurück, wenn ein Event fehlgeschlagen ist."""
+        entries = await stream_event_journal.pending(journal_batch_size)
+        if not entries:
+            journal_wakeup.clear()
+            await journal_wakeup.wait()
+            return True
 
-    async def get_last_stream_date(self, channel_name):
         conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
                                      user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                     database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        streamer_twitch_id = await self.fetch_users(names=[channel_name])
-        streamer_id = streamer_twitch_id[0].id
+                                     database=os.getenv('db_database'), timeout=10)
+        flushed = []
+        try:
+            for journal_id, event_type, event_id, streamer_id, streamer_name, occurred_at, payload in entries:
+                try:
+                    if event_type == 'stream_start':
+                        await self.apply_stream_start(conn, event_id, streamer_id, streamer_name, occurred_at)
+                    elif event_type == 'stream_end':
+                        await self.apply_stream_end(conn, event_id, streamer_id, occurred_at)
+                    elif event_type == 'channel_update':
+                        await self.apply_channel_update(conn, event_id, streamer_id, occurred_at, payload)
+                except journal_connection_errors:
+                    raise
+                except Exception as e:
+                    if conn.is_closed():
+                        raise
+                    attempts, quarantined = await stream_event_journal.record_failure(journal_id, e)
+                    logger.error(f'Journal-Event {event_id} ({event_type}) fehlgeschlagen, Versuch {attempts}/{journal_max_attempts}'
+                                 + (', in Quarantäne verschoben' if quarantined else ''),
+                                 exc_info=True, extra={'event': 'journal_flush', 'channel': streamer_name, 'streamer_id': streamer_id})
+                    return False
+                flushed.append(journal_id)
+            # Gleiche Aufbewahrung wie im lokalen Journal: ältere Event-IDs kann Twitch nicht mehr erneut zustellen.
+            await conn.execute("DELETE FROM stream_events_applied WHERE applied_at < now() - make_interval(secs => $1)",
+                               journal_retention_seconds)
+        finally:
+            await stream_event_journal.mark_flushed(flushed)
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+        return True
 
+    async def get_last_stream_date(self, conn, streamer_id):
         last_stream_date = await conn.fetchval(
             "SELECT last_live_date FROM live_channels_today WHERE streamer_id = $1", streamer_id
         )
         return last_stream_date
     
-    async def create_new_streamer_entry(self, channel_name, today):
-        conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
-                                     user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                     database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        streamer_twitch_id = await self.fetch_users(names=[channel_name])
-        streamer_id = streamer_twitch_id[0].id
-
+    async def create_new_streamer_entry(self, conn, streamer_id, today):
         await conn.execute(
             "INSERT INTO live_channels_today (streamer_id, last_live_date) VALUES ($1, $2)",
             streamer_id, str(today)
         )
 
-    async def update_last_stream_date(self, channel_name, today):
-        conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
-                                     user=os.getenv('db_user'), password=os.getenv('db_password'),
-                                     database=os.getenv('db_database'), loop=asyncio.get_event_loop())
-        
-        streamer_twitch_id = await self.fetch_users(names=[channel_name])
-        streamer_id = streamer_twitch_id[0].id
-
+    async def update_last_stream_date(self, conn, streamer_id, today):
         await conn.execute(
             "UPDATE live_channels_today SET last_live_date = $1 WHERE streamer_id = $2",
             str(today), streamer_id
         )
 
     async def event_ready(self):
-        print(f'Ready | {self.nick}')
+        logger.info(f'Ready | {self.nick}')
 
     async def event_message(self, message):
         if message.echo:
             return
         await self.handle_commands(message)
+
+    async def global_before_invoke(self, ctx):
+        ctx.started_at = time.monotonic()
+
+    async def global_after_invoke(self, ctx):
+        latency_ms = round((time.monotonic() - ctx.started_at) * 1000, 1)
+        logger.info(f'+{ctx.command.name} von {ctx.author.name}',
+                    extra={'channel': ctx.channel.name, 'command': ctx.command.name, 'latency_ms': latency_ms})
+
+    async def event_command_error(self, ctx, error):
+        if isinstance(error, UpstreamUnavailable):
+            logger.warning(f'Externer Dienst nicht erreichbar. Fehlermeldung: {str(error)}',
+                           extra={'channel': ctx.channel.name, 'command': ctx.command.name, 'host': error.host})
+            await ctx.reply("/me ⚠️ Der externe Dienst ist momentan nicht erreichbar, bitte versuche es später erneut. ⚠️")
+            return
+        # twitchio würde den Fehler nur auf stderr ausgeben, an der JSON-Pipeline vorbei.
+        logger.error(f'Fehler im Command. Fehlermeldung: {str(error)}', exc_info=error,
+                     extra={'channel': ctx.channel.name, 'command': ctx.command.name if ctx.command else None})
     
     @commands.command(name='status')
     async def status(self, ctx):
         if ctx.author.name.lower() == os.getenv('Bot_Admin'):
-            subscriptions = await esclient.get_subscriptions()
+            subscriptions = await self.get_stream_subscriptions()
             for sub in subscriptions:
-                broadcaster_id = sub.condition.get('from_broadcaster_user_id')
+                broadcaster_id = sub.condition.get('broadcaster_user_id') or sub.condition.get('from_broadcaster_user_id')
                 if broadcaster_id:
-                    print(f"Abonnement ID: {sub.id}, Kanal: {broadcaster_id}, Typ: {sub.type}")
+                    logger.info(f"Abonnement ID: {sub.id}, Kanal: {broadcaster_id}, Typ: {sub.type}")
                 else:
-                    print(f"Abonnement ID: {sub.id} hat keine Broadcaster-ID. Typ: {sub.type}")
+                    logger.info(f"Abonnement ID: {sub.id} hat keine Broadcaster-ID. Typ: {sub.type}")
+            pending, lag, failed = await stream_event_journal.lag()
+            logger.info(f"Journal: {pending} offene Stream-Events, Verzögerung: {lag:.1f}s, Quarantäne: {failed}", extra={'event': 'journal_lag'})
+            await ctx.reply(f"/me ✅ Journal: {pending} offene Stream-Events, Verzögerung: {lag:.1f}s, Quarantäne: {failed}")
+            for breaker in circuit_breakers.values():
+                latency = f'{breaker.latency * 1000:.0f}ms' if breaker.latency is not None else '-'
+                logger.info(f"Circuit Breaker: {breaker.host}, Zustand: {breaker.state}, Fehler: {breaker.failures}, Latenz: {latency}, Deadline: {breaker.deadline():.1f}s",
+                            extra={'host': breaker.host})
+            unhealthy = [f'{b.host} ({b.state})' for b in circuit_breakers.values() if b.state != 'closed']
+            await ctx.reply(f"/me ✅ Circuit Breaker: {len(circuit_breakers) - len(unhealthy)}/{len(circuit_breakers)} geschlossen"
+                            + (f" | Gestört: {', '.join(unhealthy)}" if unhealthy else ""))
+            for limiter in command_limiters.values():
+                logger.info(f"Limiter {limiter.name}", extra={'event': 'limiter_stats', 'limiter': limiter.stats()})
+            await ctx.reply("/me ✅ Limiter: " + " | ".join(
+                f"{l.name}: {l.active}/{l.limit} aktiv, {l.queued()} wartend, {l.shed} abgewiesen" for l in command_limiters.values()))
+
+    @commands.command(name='profile')
+    async def profile(self, ctx, seconds: int = 10):
+        if ctx.author.name.lower() != os.getenv('Bot_Admin'):
+            return
+        if profile_lock.locked():
+            await ctx.reply("/me ⚠️ Es läuft bereits ein Profiling. ⚠️")
+            return
+
+        seconds = max(1, min(seconds, profile_max_seconds))
+        async with profile_lock:
+            await ctx.reply(f"/me ✅ Profiling läuft für {seconds}s...")
+            path, hotspots, task_times, idle_share = await self.profile_runtime(seconds)
+
+        summary = ' | '.join(f"{name} {tottime * 1000:.0f}ms" for name, tottime in hotspots[:3])
+        top_task = f" | Task: {task_times[0][0]} {task_times[0][1] * 1000:.0f}ms" if task_times else ""
+        await ctx.reply(f"/me ✅ Profil gespeichert in {path} ({idle_share:.0f}% idle). Hotspots: {summary or '-'}{top_task}")
+
+    async def profile_runtime(self, seconds):
+        """Profiliert den Event-Loop für ein paar Sekunden mit cProfile und misst die Laufzeit pro Coroutine.
+
+        cProfile zählt eine Coroutine nur, solange sie tatsächlich läuft; beim await ist sie für den Profiler
+        zurückgekehrt. Die cumtime der Coroutine, mit der ein Task gestartet wurde, ist daher seine echte
+        Rechenzeit einschließlich aller aufgerufenen Funktionen, ohne die Zeit, in der er wartet.
+        Außerhalb dieses Aufrufs ist kein Profiler aktiv.
+        """
+        loop = asyncio.get_running_loop()
+        profiler = cProfile.Profile()
+        task_coroutines = {}
+        current = asyncio.current_task()
+
+        def remember(coro):
+            code = getattr(coro, 'cr_code', None)
+            if code is not None:
+                task_coroutines[(code.co_filename, code.co_firstlineno, code.co_name)] = code.co_qualname
+
+        for task in asyncio.all_tasks():
+            if task is not current:
+                remember(task.get_coro())
+
+        # Auch Tasks erfassen, die während des Profilings starten und wieder enden (z.B. einzelne Commands).
+        previous_factory = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            remember(coro)
+            if previous_factory is not None:
+                return previous_factory(loop, coro, **kwargs)
+            return asyncio.Task(coro, loop=loop, **kwargs)
+
+        loop.set_task_factory(task_factory)
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            loop.set_task_factory(previous_factory)
+
+        stats = pstats.Stats(profiler)
+        idle = 0.0
+        hotspots = []
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            if func in profile_idle_functions:
+                idle += tottime
+                continue
+            hotspots.append((f"{os.path.basename(filename)}:{line}({func})" if line else func, tottime, cumtime, ncalls))
+        hotspots.sort(key=lambda hotspot: hotspot[1], reverse=True)
+        task_times = sorted(((name, stats.stats[key][3]) for key, name in task_coroutines.items() if key in stats.stats),
+                            key=lambda item: item[1], reverse=True)
+
+        path = os.path.join(profile_dir, datetime.now(berlin_zone).strftime('profile-%Y%m%d-%H%M%S'))
+        await asyncio.to_thread(self.write_profile, path, stats, hotspots, task_times, seconds)
+        logger.info(f'Profil gespeichert: {path}', extra={'event': 'profile'})
+
+        return path, [(name, tottime) for name, tottime, _, _ in hotspots], task_times, idle / seconds * 100
+
+    def write_profile(self, path, stats, hotspots, task_times, seconds):
+        os.makedirs(profile_dir, exist_ok=True)
+        stats.dump_stats(path + '.prof')
+        report = io.StringIO()
+        report.write(f'Profil über {seconds}s\n\nHotspots (tottime):\n')
+        for name, tottime, cumtime, ncalls in hotspots[:30]:
+            report.write(f'{tottime:10.4f}s {cumtime:10.4f}s {ncalls:8d}  {name}\n')
+        report.write('\nLaufzeit pro Task-Coroutine (cumtime, Summe über alle Tasks):\n')
+        for name, run_time in task_times:
+            report.write(f'{run_time:10.4f}s  {name}\n')
+        report.write('\n')
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(50)
+        with open(path + '.txt', 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
 
     @commands.command(name='join')
     @commands.cooldown(rate=1, per=5, bucket=commands.Bucket.channel)
@@ -342,8 +1259,10 @@ class Bot(commands.Bot):
                     json.dump(channels, f)
                 await self.join_channels([channel])
                 broadcaster_id = await self.fetch_users(names=[channel])
-                await esclient.subscribe_channel_stream_start(broadcaster=broadcaster_id[0].id)
-                await ctx.reply(f"/me ✅ Beigetreten zum Kanal: {channel}")
+                if await self.subscribe_stream_events(broadcaster_id[0].id):
+                    await ctx.reply(f"/me ✅ Beigetreten zum Kanal: {channel}")
+                else:
+                    await ctx.reply(f"/me ⚠️ Beigetreten zum Kanal: {channel}, aber Streams werden nicht vollständig erfasst (siehe bot.log). ⚠️")
             else:
                 await ctx.reply(f"/me Ich bin bereits dem Kanal {channel} beigetreten.")
         elif ctx.author.name.lower() not in mods and ctx.author.name.lower() != os.getenv('Bot_Admin'):
@@ -358,8 +1277,10 @@ class Bot(commands.Bot):
                     json.dump(channels, f)
                 await self.join_channels([channel])
                 broadcaster_id = await self.fetch_users(names=[channel])
-                await esclient.subscribe_channel_stream_start(broadcaster=broadcaster_id[0].id)
-                await ctx.reply(f"/me ✅ Beigetreten zum Kanal: {channel}")
+                if await self.subscribe_stream_events(broadcaster_id[0].id):
+                    await ctx.reply(f"/me ✅ Beigetreten zum Kanal: {channel}")
+                else:
+                    await ctx.reply(f"/me ⚠️ Beigetreten zum Kanal: {channel}, aber Streams werden nicht vollständig erfasst (siehe bot.log). ⚠️")
 
     @commands.command(name='leave')
     @commands.cooldown(rate=1, per=5, bucket=commands.Bucket.channel)
@@ -380,9 +1301,7 @@ class Bot(commands.Bot):
                     json.dump(channels, f)
                 await self.part_channels([channel])
                 broadcaster_id = await self.fetch_users(names=[channel])
-                subscriptions = await esclient.get_subscriptions(user_id=broadcaster_id[0].id)
-                for subscription in subscriptions:
-                    await esclient.delete_subscription(subscription_id=subscription.id)
+                await self.unsubscribe_stream_events(broadcaster_id[0].id)
             else:
                 await ctx.reply(f"/me ❌ Ich bin in dem Channel nicht.")
         elif ctx.author.name.lower() not in mods and ctx.author.name.lower() != os.getenv('Bot_Admin'):
@@ -398,12 +1317,11 @@ class Bot(commands.Bot):
                     json.dump(channels, f)
                 await self.part_channels([channel])
                 broadcaster_id = await self.fetch_users(names=[channel])
-                subscriptions = await esclient.get_subscriptions(user_id=broadcaster_id[0].id)
-                for subscription in subscriptions:
-                    await esclient.delete_subscription(subscription_id=subscription.id)
+                await self.unsubscribe_stream_events(broadcaster_id[0].id)
 
     @commands.command(name='mostplayed')
     @commands.cooldown(rate=1, per=15, bucket=commands.Bucket.channel)
+    @limited('sullygnome')
     async def mostplayed(self, ctx, streamer_name: Optional[str] = None, num_games: int = 5):
         if num_games > 10:
             num_games = 10
@@ -413,34 +1331,54 @@ class Bot(commands.Bot):
         if streamer_name is None:
             streamer_name = ctx.channel.name
 
-        url = f"https://sullygnome.com/api/standardsearch/{streamer_name}/false/true/false/false"
-        response = requests.get(url)
-        data = response.json()
-        if not data:
-            await ctx.reply("/me ⚠️ Der gesuchte Streamer wurde nicht gefunden! ⚠️")
-            return
-        
-        streamer_id = data[0]['value']
-        safe_streamer_name = data[0]['displaytext']
+        games, covered = [], False
+        safe_streamer_name = streamer_name
+        try:
+            streamer_twitch_id = await self.fetch_users(names=[streamer_name])
+            if streamer_twitch_id:
+                safe_streamer_name = streamer_twitch_id[0].display_name
+                conn = await asyncpg.connect(host=os.getenv('db_host_ip'), port=os.getenv('db_port'),
+                                             user=os.getenv('db_user'), password=os.getenv('db_password'),
+                                             database=os.getenv('db_database'), timeout=10)
+                try:
+                    games, covered = await self.local_most_played(conn, streamer_twitch_id[0].id)
+                finally:
+                    await conn.close()
+        except journal_connection_errors + (twitchio.HTTPException,) as e:
+            # Ohne Postgres oder Helix bleibt sullygnome als Quelle, wie vor den eigenen Stream-Daten.
+            logger.warning(f'Eigene Spielzeiten für {streamer_name} nicht abrufbar. Fehlermeldung: {str(e)}',
+                           extra={'channel': ctx.channel.name, 'command': 'mostplayed'})
+            games, covered = [], False
+
+        # Eigene Daten nur nehmen, wenn sie das ganze Jahr abdecken, sonst wären die Prozente verzerrt.
+        if not covered and sullygnome_backfill:
+            try:
+                sullygnome_games = await self.sullygnome_most_played(streamer_name)
+            except UpstreamUnavailable:
+                if not games:
+                    raise
+                logger.warning(f'sullygnome nicht erreichbar, nutze unvollständige eigene Daten für {streamer_name}',
+                               extra={'channel': ctx.channel.name, 'command': 'mostplayed'})
+            else:
+                if sullygnome_games is None and not games:
+                    await ctx.reply("/me ⚠️ Der gesuchte Streamer wurde nicht gefunden! ⚠️")
+                    return
+                if sullygnome_games is not None and sullygnome_games[1]:
+                    safe_streamer_name, games = sullygnome_games
 
-        url = f"https://sullygnome.com/api/tables/channeltables/games/365/{streamer_id}/%20/1/2/desc/0/100"
-        response = requests.get(url)
-        data = response.json()
-        
-        if not data['data']:
+        if not games:
             await ctx.reply(f"/me ⚠️ {safe_streamer_name} hat noch kein Spiel gespielt oder wird noch nicht getrackt. ⚠️")
             return
 
-        num_games = min(num_games, len(data['data']))
+        num_games = min(num_games, len(games))
         messages = []
         current_message = f"{safe_streamer_name}: "
         for i in range(num_games):
-            game = data['data'][i]
-            game_name = game['gamesplayed'].split('|')[0]
+            game_name, game_stream_time, channel_stream_time = games[i]
             if '.' in game_name:
                 game_name = game_name.replace('.', '(.)')
-            stream_time = round(game['streamtime'] / 60, 1)
-            total_stream_time = game['channelstreamtime'] / 60
+            stream_time = round(game_stream_time / 60, 1)
+            total_stream_time = channel_stream_time / 60
             percentage = round((stream_time / total_stream_time) * 100, 1)
 
             if stream_time.is_integer():
@@ -461,6 +1399,45 @@ class Bot(commands.Bot):
             await ctx.reply('/me ✅ ' + message)
             await asyncio.sleep(0.5)
 
+    async def sullygnome_most_played(self, streamer_name):
+        """Spielzeit pro Spiel der letzten 365 Tage laut sullygnome, in Minuten. None, wenn der Streamer unbekannt ist."""
+        url = f"https://sullygnome.com/api/standardsearch/{streamer_name}/false/true/false/false"
+        status, body = await upstream_request("GET", url)
+        data = json.loads(body)
+        if not data:
+            return None
+
+        streamer_id = data[0]['value']
+        safe_streamer_name = data[0]['displaytext']
+
+        url = f"https://sullygnome.com/api/tables/channeltables/games/365/{streamer_id}/%20/1/2/desc/0/100"
+        status, body = await upstream_request("GET", url)
+        data = json.loads(body)
+        return safe_streamer_name, [(game['gamesplayed'].split('|')[0], game['streamtime'], game['channelstreamtime'])
+                                    for game in data['data']]
+
+    async def local_most_played(self, conn, channel_id):
+        """Spielzeit pro Kategorie der letzten 365 Tage aus den eigenen Stream-Segmenten, in Minuten.
+
+        Gibt zusätzlich zurück, ob die eigene Aufzeichnung das ganze Jahr abdeckt.
+        """
+        covered = await conn.fetchval(
+            "SELECT min(started_at) <= now() - interval '365 days' FROM stream_sessions WHERE channel_id = $1",
+            channel_id
+        )
+        rows = await conn.fetch('''
+            SELECT COALESCE(category_name, 'Unbekannt') AS game_name,
+                   SUM(EXTRACT(EPOCH FROM COALESCE(ended_at, now()) - started_at)) / 60 AS stream_time,
+                   SUM(SUM(EXTRACT(EPOCH FROM COALESCE(ended_at, now()) - started_at))) OVER () / 60 AS channel_stream_time
+            FROM stream_game_segments
+            WHERE channel_id = $1 AND started_at >= now() - interval '365 days'
+            GROUP BY 1
+            ORDER BY 2 DESC
+        ''', channel_id)
+        games = [(row['game_name'], float(row['stream_time']), float(row['channel_stream_time']))
+                 for row in rows if row['channel_stream_time']]
+        return games, bool(covered)
+
     @commands.command(name='bayrisch')
     @commands.cooldown(rate=1, per=15, bucket=commands.Bucket.channel)
     async def bayrisch(self, ctx, *, message=None):
@@ -477,8 +1454,8 @@ class Bot(commands.Bot):
                 'origin': 'https://de.cdn.mr-dialect.com',
                 'referer': 'https://de.cdn.mr-dialect.com/'
             }
-            response = requests.request("POST", url, headers=headers, data=payload)
-            response_json = json.loads(response.text)
+            status, body = await upstream_request("POST", url, headers=headers, data=payload)
+            response_json = json.loads(body)
             translated_message = response_json['bot'].strip('"')
             await ctx.reply('/me ✅ ' + translated_message)
 
@@ -498,8 +1475,8 @@ class Bot(commands.Bot):
                 'origin': 'https://de.cdn.mr-dialect.com',
                 'referer': 'https://de.cdn.mr-dialect.com/'
             }
-            response = requests.request("POST", url, headers=headers, data=payload)
-            response_json = json.loads(response.text)
+            status, body = await upstream_request("POST", url, headers=headers, data=payload)
+            response_json = json.loads(body)
             translated_message = response_json['bot'].strip('"')
             await ctx.reply('/me ✅ ' + translated_message)
 
@@ -508,8 +1485,8 @@ class Bot(commands.Bot):
     async def freegames(self, ctx):
         url = "https://store-site-backend-static-ipv4.ak.epicgames.com/freeGamesPromotions?locale=en-US&country=DE&allowCountries=DE"
         headers = {}
-        response = requests.request("GET", url, headers=headers)
-        data = json.loads(response.text)
+        status, body = await upstream_request("GET", url, headers=headers)
+        data = json.loads(body)
         free_games = []
 
         for element in data['data']['Catalog']['searchStore']['elements']:
@@ -545,6 +1522,7 @@ class Bot(commands.Bot):
 
     @commands.command(name='logs', aliases=['log'])
     @commands.cooldown(rate=1, per=10, bucket=commands.Bucket.channel)
+    @limited('logs')
     async def searchlogs(self, ctx, channel_name=None, username=None):
         if channel_name is None:
             channel_name = ctx.channel.name
@@ -620,11 +1598,9 @@ class Bot(commands.Bot):
                                     database=os.getenv('db_database'))
         if time_parts:
             mods = await self.get_mods(os.getenv('Bot_Admin'))
-            print(mods)
             if ctx.author.name not in mods:
                 await ctx.reply('/me ❌ Nur Moderatoren können die Zeit hinzufügen.')
                 return
-            print(time_parts)
             time = " ".join(time_parts)
             parts = time.lower().split()
             hours = 0
@@ -632,22 +1608,18 @@ class Bot(commands.Bot):
             seconds = 0
             for part in parts:
                 if "h" in part:
-                    print("nur h detected")
                     hours = part.split("h")[0]
                 elif "m" in part:
-                    print("nur m detected")
                     minutes = part.split("m")[0]
                 elif "s" in part:
-                    print("nur s detected")
                     seconds = part.split("s")[0]
                 time_in_seconds = int(minutes) * 60 + int(hours) * 3600 + int(seconds)
-                print(time_in_seconds)
-            print(streamer_name)
+            logger.info(f'Restream-Zeit geparst: {time_parts} -> {time_in_seconds}s für {streamer_name}',
+                        extra={'channel': ctx.channel.name, 'command': 'restreams'})
             streamer_twitch_id = await self.fetch_users(names=[streamer_name])
             if not streamer_twitch_id:
                 await ctx.reply('/me ⚠️ Kein Kanal gefunden mit diesem Namen. ⚠️')
                 return
-            print(streamer_twitch_id[0].id)
             await conn.execute('''
                 INSERT INTO twitch_channels(channel_id, watch_time) VALUES($1, $2)
                 ON CONFLICT (channel_id) DO UPDATE SET watch_time = twitch_channels.watch_time + $2
@@ -720,33 +1692,19 @@ class Bot(commands.Bot):
             channel_name = ctx.channel.name.lower()
         mods = await self.get_mods(channel_name)
         if ctx.author.name.lower() in mods or ctx.author.name.lower() == os.getenv('Bot_Admin'):
-            url = f"https://sullygnome.com/api/standardsearch/{channel_name}/false/true/false/false"
-            response = requests.get(url)
-            data = response.json()
-
-            if not data:
-                await ctx.reply("/me ⚠️ Der Streamer wird nicht auf sullygnome getracked. ⚠️")
+            if not sullygnome_backfill:
+                await ctx.reply("/me ⚠️ Der Abgleich mit sullygnome ist deaktiviert, die Offdays werden direkt aus den Streams erfasst. ⚠️")
                 return
 
-            streamer_id = data[0]['value']
-
-            all_streams = []
-            offset = 0
-
-            while True:
-                streams_url = f"https://sullygnome.com/api/tables/channeltables/streams/365/{streamer_id}/%20/1/1/desc/{offset}/100"
-                response = requests.get(streams_url)
-                streams_data = response.json()
-
-                if not streams_data['data']:
-                    break
-
-                all_streams.extend(streams_data['data'])
-
-                if len(streams_data['data']) < 100:
-                    break
+            # Erst nach der Rechteprüfung einen Platz belegen, sonst blockieren Nicht-Mods echte Anfragen.
+            async with command_slot(ctx, 'sullygnome') as admitted:
+                if not admitted:
+                    return
+                all_streams = await self.sullygnome_streams(channel_name)
 
-                offset += 100
+            if all_streams is None:
+                await ctx.reply("/me ⚠️ Der Streamer wird nicht auf sullygnome getracked. ⚠️")
+                return
 
             live_days_per_month = defaultdict(int)
 
@@ -756,13 +1714,44 @@ class Bot(commands.Bot):
                 month = stream_date.month
                 live_days_per_month[(year, month)] += 1
 
-            print(f"Off-days found: {live_days_per_month} | {channel_name}")
+            logger.info(f"Off-days found: {dict(live_days_per_month)} | {channel_name}", extra={'channel': channel_name, 'command': 'update'})
 
             await self.update_offdays_in_db(channel_name, live_days_per_month)
             await ctx.reply(f'/me ✅ Die Offdays wurden erfolgreich aktualisiert für den Channel: {channel_name}!')
         else:
             await ctx.reply("/me ❌ Nur der Streamer und die Moderatoren können diesen Command ausführen.")
 
+    async def sullygnome_streams(self, channel_name):
+        """Alle Streams der letzten 365 Tage laut sullygnome. None, wenn der Streamer dort nicht getrackt wird."""
+        url = f"https://sullygnome.com/api/standardsearch/{channel_name}/false/true/false/false"
+        status, body = await upstream_request("GET", url)
+        data = json.loads(body)
+
+        if not data:
+            return None
+
+        streamer_id = data[0]['value']
+
+        all_streams = []
+        offset = 0
+
+        while True:
+            streams_url = f"https://sullygnome.com/api/tables/channeltables/streams/365/{streamer_id}/%20/1/1/desc/{offset}/100"
+            status, body = await upstream_request("GET", streams_url)
+            streams_data = json.loads(body)
+
+            if not streams_data['data']:
+                break
+
+            all_streams.extend(streams_data['data'])
+
+            if len(streams_data['data']) < 100:
+                break
+
+            offset += 100
+
+        return all_streams
+
     async def update_offdays_in_db(self, channel_name, live_days_per_month):
         conn = await asyncpg.connect(
             host=os.getenv('db_host_ip'), 
@@ -794,17 +1783,27 @@ class Bot(commands.Bot):
 
         await conn.close()
 
-bot = Bot()
-bot.loop.run_until_complete(bot.__ainit__())
-bot.loop.run_until_complete(bot.create_database_tables())
-async def schedule_daily_reset():
+async def schedule_daily_reset(bot):
     while True:
         now = datetime.now(berlin_zone)
         midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         seconds_until_midnight = (midnight - now).total_seconds()
-        print(seconds_until_midnight)
+        logger.info(f'Nächster Streak-Reset in {seconds_until_midnight:.0f}s', extra={'event': 'daily_reset'})
         await asyncio.sleep(seconds_until_midnight)
         await bot.reset_streaks()
 
-bot.loop.create_task(schedule_daily_reset())
-bot.run()
+
+async def log_limiter_stats():
+    while True:
+        await asyncio.sleep(limiter_stats_interval)
+        for limiter in command_limiters.values():
+            logger.info(f"Limiter {limiter.name}", extra={'event': 'limiter_stats', 'limiter': limiter.stats()})
+
+
+if __name__ == '__main__':
+    bot = Bot()
+    bot.loop.run_until_complete(bot.__ainit__())
+    bot.loop.create_task(schedule_daily_reset(bot))
+    bot.loop.create_task(bot.flush_stream_event_journal())
+    bot.loop.create_task(log_limiter_stats())
+    bot.run()
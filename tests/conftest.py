@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+
+# bot.py legt beim Import Log-Datei, channels.json und Journal im aktuellen Verzeichnis an.
+workdir = tempfile.mkdtemp(prefix='spofohbot-tests-')
+os.chdir(workdir)
+os.environ['journal_path'] = os.path.join(workdir, 'stream_journal.sqlite3')
+os.environ.setdefault('Twitch_Generator_Token', 'oauth:test')
+os.environ.setdefault('Twitch_Generator_ID', 'test')
+os.environ.setdefault('Twitch_App_ID', 'test-app')
+os.environ.setdefault('Not_leaveable', 'testchannel')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot as bot_module  # noqa: E402
+
+
+class LocalPostgres:
+    """Wegwerf-Postgres über pgserver, das sich für Tests stoppen und wieder starten lässt."""
+
+    def __init__(self, pgdata):
+        import pgserver
+        self.server = pgserver.get_server(pgdata, cleanup_mode='delete')
+        info = self.server.get_postmaster_info()
+        self.pgdata = pgdata
+        self.socket_dir = info.socket_dir
+        self.port = info.port
+
+    def stop(self):
+        from pgserver._commands import pg_ctl
+        pg_ctl(['-w', '-m', 'fast', 'stop'], pgdata=self.pgdata, user=self.server.system_user)
+
+    def start(self):
+        from pgserver._commands import pg_ctl
+        pg_ctl(['-w', '-o', '-h ""', '-o', f'-k {self.socket_dir}', '-l', str(self.server.log), 'start'],
+               pgdata=self.pgdata, user=self.server.system_user, timeout=30)
+
+    def env(self):
+        return {'db_host_ip': str(self.socket_dir), 'db_port': str(self.port), 'db_user': 'postgres',
+                'db_password': '', 'db_database': 'postgres'}
+
+
+@pytest.fixture(scope='session')
+def postgres():
+    pytest.importorskip('pgserver')
+    pgdata = Path(tempfile.mkdtemp(prefix='spofohbot-pg-'))
+    server = LocalPostgres(pgdata)
+    for key, value in server.env().items():
+        os.environ[key] = value
+    yield server
+    server.server.cleanup()
+
+
+class FakeContext:
+    """Das Nötigste von twitchios Context, um Commands direkt aufzurufen."""
+
+    def __init__(self, author, channel='testchannel', command='test', is_mod=False):
+        self.author = SimpleNamespace(name=author, is_mod=is_mod)
+        self.channel = SimpleNamespace(name=channel)
+        self.command = SimpleNamespace(name=command)
+        self.replies = []
+
+    async def reply(self, message):
+        self.replies.append(message)
+
+
+@pytest.fixture
+def make_ctx():
+    return FakeContext
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = bot_module.StreamEventJournal(str(tmp_path / 'journal.sqlite3'))
+    monkeypatch.setattr(bot_module, 'stream_event_journal', journal)
+    return journal
+
+
+@pytest.fixture(scope='session')
+def bot():
+    return bot_module.Bot()
+
+
+@pytest.fixture
+async def db(postgres, bot):
+    await bot.create_database_tables()
+    conn = await asyncpg.connect(host=str(postgres.socket_dir), port=postgres.port, user='postgres', database='postgres')
+    yield conn
+    await conn.close()
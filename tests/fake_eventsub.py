@@ -0,0 +1,150 @@
+"""Minimaler EventSub-WebSocket-Server samt Helix-Subscription-Endpunkt für Tests."""
+import asyncio
+import itertools
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class FakeEventSub:
+    def __init__(self, keepalive_timeout=10, max_total_cost=10):
+        self.keepalive_timeout = keepalive_timeout
+        # Wie bei Twitch: jedes WebSocket-Abonnement kostet 1, außer der Nutzer aus der Condition hat den Token autorisiert.
+        self.max_total_cost = max_total_cost
+        self.authorized_users = set()
+        self.sessions = {}
+        self.subscriptions = {}
+        self.refuse_connections = 0
+        self._ids = itertools.count(1)
+        self.app = web.Application()
+        self.app.router.add_get('/ws', self.websocket)
+        self.app.router.add_post('/helix/eventsub/subscriptions', self.create_subscription)
+        self.app.router.add_get('/helix/eventsub/subscriptions', self.list_subscriptions)
+        self.app.router.add_delete('/helix/eventsub/subscriptions', self.delete_subscription)
+        self.runner = None
+        self.base_url = None
+
+    async def start(self, port):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', port).start()
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    async def stop(self):
+        for ws in list(self.sessions.values()):
+            await ws.close()
+        await self.runner.cleanup()
+
+    @property
+    def ws_url(self):
+        return f'{self.base_url}/ws'
+
+    @property
+    def helix_url(self):
+        return f'{self.base_url}/helix'
+
+    def open_sessions(self):
+        return [session_id for session_id, ws in self.sessions.items() if not ws.closed]
+
+    def total_cost(self):
+        return sum(sub['cost'] for sub in self.subscriptions.values())
+
+    def subscriptions_for(self, session_id):
+        return [sub for sub in self.subscriptions.values() if sub['transport']['session_id'] == session_id]
+
+    async def websocket(self, request):
+        if self.refuse_connections:
+            self.refuse_connections -= 1
+            return web.Response(status=503)
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = f'session-{next(self._ids)}'
+        self.sessions[session_id] = ws
+        # Wie bei Twitch wandern die Abonnements beim session_reconnect auf die neue Session.
+        for sub in self.subscriptions_for(request.query.get('reconnect')):
+            sub['transport']['session_id'] = session_id
+        await ws.send_json({
+            'metadata': {'message_id': f'welcome-{session_id}', 'message_type': 'session_welcome', 'message_timestamp': now_iso()},
+            'payload': {'session': {'id': session_id, 'status': 'connected', 'connected_at': now_iso(),
+                                    'keepalive_timeout_seconds': self.keepalive_timeout, 'reconnect_url': None}},
+        })
+        async for _ in ws:
+            pass
+        # Twitch löscht WebSocket-Abonnements, sobald ihre Verbindung endet.
+        for sub in self.subscriptions_for(session_id):
+            del self.subscriptions[sub['id']]
+        return ws
+
+    async def send_keepalive(self, session_id):
+        await self.sessions[session_id].send_json({
+            'metadata': {'message_id': f'keepalive-{next(self._ids)}', 'message_type': 'session_keepalive',
+                         'message_timestamp': now_iso()},
+            'payload': {},
+        })
+
+    async def send_reconnect(self, session_id):
+        await self.sessions[session_id].send_json({
+            'metadata': {'message_id': f'reconnect-{next(self._ids)}', 'message_type': 'session_reconnect',
+                         'message_timestamp': now_iso()},
+            'payload': {'session': {'id': session_id, 'status': 'reconnecting', 'connected_at': now_iso(),
+                                    'keepalive_timeout_seconds': None, 'reconnect_url': f'{self.ws_url}?reconnect={session_id}'}},
+        })
+
+    async def send_notification(self, session_id, subscription_type, event, message_id=None):
+        subscription = next(sub for sub in self.subscriptions_for(session_id) if sub['type'] == subscription_type)
+        await self.sessions[session_id].send_json({
+            'metadata': {'message_id': message_id or f'notification-{next(self._ids)}', 'message_type': 'notification',
+                         'message_timestamp': now_iso(), 'subscription_type': subscription_type,
+                         'subscription_version': subscription['version']},
+            'payload': {'subscription': subscription, 'event': event},
+        })
+
+    async def drop(self, session_id):
+        await self.sessions[session_id].close()
+
+    async def create_subscription(self, request):
+        body = await request.json()
+        if body['transport']['session_id'] not in self.open_sessions():
+            return web.json_response({'error': 'Bad Request', 'status': 400, 'message': 'unknown session'}, status=400)
+        cost = 0 if body['condition'].get('broadcaster_user_id') in self.authorized_users else 1
+        if self.total_cost() + cost > self.max_total_cost:
+            return web.json_response({'error': 'Too Many Requests', 'status': 429,
+                                      'message': 'websocket transport cost exceeded'}, status=429)
+        subscription = {
+            'id': f'sub-{next(self._ids)}', 'status': 'enabled', 'type': body['type'], 'version': body['version'],
+            'cost': cost, 'condition': body['condition'], 'created_at': now_iso(),
+            'transport': {'method': 'websocket', 'session_id': body['transport']['session_id'], 'connected_at': now_iso()},
+        }
+        self.subscriptions[subscription['id']] = subscription
+        return web.json_response({'data': [subscription], 'total': len(self.subscriptions),
+                                  'total_cost': self.total_cost(), 'max_total_cost': self.max_total_cost}, status=202)
+
+    async def list_subscriptions(self, request):
+        user_id = request.query.get('user_id')
+        data = [sub for sub in self.subscriptions.values()
+                if user_id is None or sub['condition'].get('broadcaster_user_id') == user_id]
+        return web.json_response({'data': data, 'total': len(data), 'total_cost': self.total_cost(),
+                                  'max_total_cost': self.max_total_cost})
+
+    async def delete_subscription(self, request):
+        self.subscriptions.pop(request.query['id'], None)
+        return web.Response(status=204)
+
+
+async def eventually(predicate, timeout=10):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        result = predicate()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return
+        if loop.time() > deadline:
+            raise AssertionError('Bedingung nicht rechtzeitig erfüllt')
+        await asyncio.sleep(0.05)
@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import bot as bot_module
+from fake_eventsub import now_iso
+
+SECRET = 'webhook-secret'
+
+
+@pytest.fixture
+async def webhook(monkeypatch):
+    monkeypatch.setattr(bot_module.esbot, 'loop', asyncio.get_running_loop())
+    app = bot_module.JournalingEventSubClient(bot_module.esbot, webhook_secret=SECRET,
+                                              callback_route='https://eventsub.example/callback')
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+def signed(message_id, body):
+    timestamp = now_iso()
+    signature = hmac.new(SECRET.encode(), (message_id + timestamp + body).encode(), hashlib.sha256).hexdigest()
+    return {'Twitch-Eventsub-Message-Id': message_id, 'Twitch-Eventsub-Message-Timestamp': timestamp,
+            'Twitch-Eventsub-Message-Signature': f'sha256={signature}', 'Twitch-Eventsub-Message-Retry': '0',
+            'Twitch-Eventsub-Message-Type': 'notification', 'Twitch-Eventsub-Subscription-Type': 'stream.online',
+            'Twitch-Eventsub-Subscription-Version': '1'}
+
+
+def stream_online_body(stream_id):
+    return json.dumps({
+        'subscription': {'id': 'sub-1', 'status': 'enabled', 'type': 'stream.online', 'version': '1', 'cost': 0,
+                         'condition': {'broadcaster_user_id': '4711'}, 'created_at': now_iso(),
+                         'transport': {'method': 'webhook', 'callback': 'https://eventsub.example/callback'}},
+        'event': {'id': stream_id, 'broadcaster_user_id': '4711', 'broadcaster_user_login': 'teststreamer',
+                  'broadcaster_user_name': 'teststreamer', 'type': 'live', 'started_at': now_iso()},
+    })
+
+
+async def test_notification_is_journaled_before_ack(webhook, journal):
+    body = stream_online_body('stream-hook-1')
+    response = await webhook.post('/callback', data=body, headers=signed('msg-hook-1', body))
+
+    assert response.status == 200
+    # Kein Warten nötig: das Event muss vor der 200-Antwort im Journal stehen.
+    assert [entry[2] for entry in await journal.pending(10)] == ['stream-hook-1']
+
+
+async def test_failed_journal_write_asks_twitch_to_retry(webhook, journal, monkeypatch):
+    async def broken_append(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(journal, 'append', broken_append)
+
+    body = stream_online_body('stream-hook-2')
+    response = await webhook.post('/callback', data=body, headers=signed('msg-hook-2', body))
+
+    assert response.status == 500
+
+
+async def test_invalid_signature_is_rejected(webhook, journal):
+    body = stream_online_body('stream-hook-3')
+    headers = signed('msg-hook-3', body)
+    headers['Twitch-Eventsub-Message-Signature'] = 'sha256=' + '0' * 64
+    response = await webhook.post('/callback', data=body, headers=headers)
+
+    assert response.status == 400
+    assert await journal.pending(10) == []
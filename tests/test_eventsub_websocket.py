@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+import twitchio
+from twitchio.ext import eventsub
+
+import bot as bot_module
+from fake_eventsub import FakeEventSub, eventually, now_iso
+
+STREAM_TYPES = {'stream.online', 'stream.offline', 'channel.update'}
+
+
+@pytest.fixture
+async def fake_eventsub(unused_tcp_port_factory):
+    server = FakeEventSub()
+    await server.start(unused_tcp_port_factory())
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def ws_client(fake_eventsub, journal, monkeypatch):
+    monkeypatch.setattr(eventsub.Websocket, 'URL', fake_eventsub.ws_url)
+    monkeypatch.setattr(twitchio.http.Route, 'BASE_URL', fake_eventsub.helix_url)
+    monkeypatch.setattr(bot_module.esbot, 'loop', asyncio.get_running_loop())
+    monkeypatch.setattr(bot_module, 'circuit_breakers', {})
+
+    client = eventsub.EventSubWSClient(bot_module.esbot)
+    monkeypatch.setattr(bot_module, 'esclient', client)
+    monkeypatch.setattr(bot_module, 'eventsub_sockets', bot_module.EventSubSockets(client))
+    monkeypatch.setattr(bot_module, 'eventsub_transport', 'websocket')
+    monkeypatch.setattr(bot_module, 'eventsub_ws_token', 'test-token')
+    monkeypatch.setattr(bot_module, 'eventsub_ws_check_interval', 0.05)
+    yield client
+
+    for sock in client._sockets:
+        if sock._pump_task is not None:
+            sock._pump_task.cancel()
+        if sock.is_connected:
+            await sock._sock.close()
+
+
+@pytest.fixture
+async def supervisor(bot, ws_client):
+    task = asyncio.create_task(bot.supervise_eventsub_websocket())
+    yield task
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def types_on(server, session_id):
+    return {sub['type'] for sub in server.subscriptions_for(session_id)}
+
+
+def stream_online(stream_id, broadcaster_id='4711'):
+    return {'id': stream_id, 'broadcaster_user_id': broadcaster_id, 'broadcaster_user_login': 'teststreamer',
+            'broadcaster_user_name': 'teststreamer', 'type': 'live', 'started_at': now_iso()}
+
+
+async def journaled_ids(journal):
+    return [entry[2] for entry in await journal.pending(100)]
+
+
+async def test_notification_is_journaled(bot, ws_client, fake_eventsub, journal):
+    await bot.subscribe_stream_events(4711)
+    [session] = fake_eventsub.open_sessions()
+    assert types_on(fake_eventsub, session) == STREAM_TYPES
+
+    await fake_eventsub.send_keepalive(session)
+    await fake_eventsub.send_notification(session, 'stream.online', stream_online('stream-ws-1'))
+    await eventually(lambda: _contains(journal, 'stream-ws-1'))
+
+
+async def test_session_reconnect_keeps_subscriptions(bot, ws_client, fake_eventsub, journal):
+    await bot.subscribe_stream_events(4711)
+    [old_session] = fake_eventsub.open_sessions()
+
+    await fake_eventsub.send_reconnect(old_session)
+    await eventually(lambda: fake_eventsub.open_sessions() and fake_eventsub.open_sessions() != [old_session])
+    [new_session] = fake_eventsub.open_sessions()
+
+    # Nach session_reconnect bleiben die Abonnements bestehen und dürfen nicht doppelt angelegt werden.
+    assert len(fake_eventsub.subscriptions) == 3
+    assert types_on(fake_eventsub, new_session) == STREAM_TYPES
+    [sock] = bot_module.eventsub_sockets.sockets()
+    assert sock.session_id == new_session
+    assert bot_module.eventsub_sockets.is_healthy(sock)
+
+    await fake_eventsub.send_notification(new_session, 'stream.online', stream_online('stream-ws-2'))
+    await eventually(lambda: _contains(journal, 'stream-ws-2'))
+
+
+async def test_supervisor_resubscribes_dropped_socket(bot, ws_client, fake_eventsub, supervisor):
+    await bot.subscribe_stream_events(4711)
+    [old_session] = fake_eventsub.open_sessions()
+
+    # twitchio verbindet nach einem Close des Servers nicht selbst neu; der erste Versuch des Supervisors scheitert.
+    fake_eventsub.refuse_connections = 1
+    await fake_eventsub.drop(old_session)
+    await eventually(lambda: fake_eventsub.open_sessions() and fake_eventsub.open_sessions() != [old_session])
+    [new_session] = fake_eventsub.open_sessions()
+
+    await eventually(lambda: types_on(fake_eventsub, new_session) == STREAM_TYPES)
+    assert fake_eventsub.refuse_connections == 0
+    [sock] = bot_module.eventsub_sockets.sockets()
+    assert bot_module.eventsub_sockets.is_healthy(sock)
+
+
+async def test_keepalive_timeout_resubscribes(bot, ws_client, fake_eventsub):
+    fake_eventsub.keepalive_timeout = 1
+    await bot.subscribe_stream_events(4711)
+    [old_session] = fake_eventsub.open_sessions()
+
+    await eventually(lambda: fake_eventsub.open_sessions() and fake_eventsub.open_sessions() != [old_session])
+    [new_session] = fake_eventsub.open_sessions()
+    await eventually(lambda: types_on(fake_eventsub, new_session) == STREAM_TYPES)
+
+
+async def test_unsubscribed_channel_is_not_resubscribed(bot, ws_client, fake_eventsub, supervisor):
+    await bot.subscribe_stream_events(4711)
+    await bot.subscribe_stream_events(4712)
+    [old_session] = fake_eventsub.open_sessions()
+
+    await bot.unsubscribe_stream_events(4711)
+    assert {sub['condition']['broadcaster_user_id'] for sub in fake_eventsub.subscriptions.values()} == {'4712'}
+
+    await fake_eventsub.drop(old_session)
+    await eventually(lambda: fake_eventsub.open_sessions() and fake_eventsub.open_sessions() != [old_session])
+    [new_session] = fake_eventsub.open_sessions()
+    await eventually(lambda: len(fake_eventsub.subscriptions_for(new_session)) == 3)
+    assert {sub['condition']['broadcaster_user_id'] for sub in fake_eventsub.subscriptions_for(new_session)} == {'4712'}
+
+
+async def _contains(journal, event_id):
+    return event_id in await journaled_ids(journal)
+
+
+async def test_cost_cap_failures_are_logged_per_channel(bot, ws_client, fake_eventsub, caplog):
+    for broadcaster_id in (5001, 5002, 5003):
+        assert await bot.subscribe_stream_events(broadcaster_id)
+
+    # Vom vierten Kanal passt nur noch ein Abonnement unter max_total_cost=10.
+    assert not await bot.subscribe_stream_events(5004)
+
+    failures = [record for record in caplog.records if getattr(record, 'event', None) == 'eventsub_subscribe']
+    assert [(record.streamer_id, record.getMessage().split()[1]) for record in failures] == \
+        [(5004, 'stream.offline'), (5004, 'channel.update')]
+    assert fake_eventsub.total_cost() == 10
+
+
+async def test_authorized_broadcasters_do_not_count_against_the_cap(bot, ws_client, fake_eventsub):
+    fake_eventsub.authorized_users = {str(broadcaster_id) for broadcaster_id in range(6001, 6006)}
+    for broadcaster_id in range(6001, 6006):
+        assert await bot.subscribe_stream_events(broadcaster_id)
+    assert fake_eventsub.total_cost() == 0
+    assert len(fake_eventsub.subscriptions) == 15
+
+
+async def test_unsubscribing_frees_cost_for_the_next_channel(bot, ws_client, fake_eventsub):
+    for broadcaster_id in (7001, 7002, 7003):
+        assert await bot.subscribe_stream_events(broadcaster_id)
+    assert await bot.subscribe_stream_events(7004) is False
+
+    await bot.unsubscribe_stream_events(7001)
+    await bot.unsubscribe_stream_events(7004)
+
+    assert await bot.subscribe_stream_events(7005)
+    assert fake_eventsub.total_cost() == 9
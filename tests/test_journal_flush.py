@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import asyncpg
+
+import bot as bot_module
+
+
+async def wait_for(predicate, timeout):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError('Bedingung nicht rechtzeitig erfüllt')
+        await asyncio.sleep(0.2)
+
+
+async def test_flusher_survives_postgres_outage(postgres, journal, bot, monkeypatch):
+    lookups = []
+
+    async def no_channel(broadcaster):
+        lookups.append(broadcaster)
+        raise RuntimeError('kein Twitch im Test')
+    monkeypatch.setattr(bot, 'fetch_channel', no_channel)
+    bot.database_tables_ready = False
+
+    postgres.stop()
+    started_at = datetime(2024, 5, 1, 18, 0, tzinfo=timezone.utc)
+    await journal.append('stream_start', 'stream-1', 4711, 'teststreamer', started_at)
+    flusher = asyncio.create_task(bot.flush_stream_event_journal())
+    try:
+        await asyncio.sleep(2)
+        assert not flusher.done()
+        assert not bot.database_tables_ready
+        pending, _, failed = await journal.lag()
+        assert (pending, failed) == (1, 0)
+
+        postgres.start()
+        await wait_for(lambda: _drained(journal), timeout=30)
+        assert bot.database_tables_ready
+
+        conn = await asyncpg.connect(host=str(postgres.socket_dir), port=postgres.port, user='postgres', database='postgres')
+        try:
+            session = await conn.fetchrow("SELECT channel_id, started_at, ended_at FROM stream_sessions WHERE stream_id = 'stream-1'")
+            streak = await conn.fetchval("SELECT current_streak FROM streaks WHERE streamer_id = 4711")
+        finally:
+            await conn.close()
+        assert session['channel_id'] == 4711
+        assert session['started_at'] == started_at
+        assert session['ended_at'] is None
+        assert streak == 1
+        assert lookups == ['4711']
+    finally:
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+
+
+async def _drained(journal):
+    pending, _, _ = await journal.lag()
+    return pending == 0
+
+
+def offline_notification(message_id, broadcaster_id=4712, name='teststreamer'):
+    broadcaster = SimpleNamespace(id=broadcaster_id, name=name)
+    return SimpleNamespace(headers=SimpleNamespace(message_id=message_id), data=SimpleNamespace(broadcaster=broadcaster))
+
+
+async def test_redelivered_stream_end_is_journaled_once(journal):
+    await bot_module.Bot.event_eventsub_notification_stream_end(offline_notification('msg-1'))
+    await asyncio.sleep(0.01)
+    await bot_module.Bot.event_eventsub_notification_stream_end(offline_notification('msg-1'))
+
+    entries = await journal.pending(10)
+    assert [entry[2] for entry in entries] == ['stream_end:msg-1']
+
+
+async def test_flush_prunes_old_applied_event_ids(db, journal, bot):
+    await db.execute("INSERT INTO stream_events_applied (event_id, applied_at) VALUES ('old', now() - interval '8 days'), "
+                     "('recent', now() - interval '1 day')")
+    await bot_module.Bot.event_eventsub_notification_stream_end(offline_notification('msg-2'))
+
+    assert await bot.flush_stream_event_batch()
+    remaining = {row['event_id'] for row in await db.fetch("SELECT event_id FROM stream_events_applied")}
+    assert 'old' not in remaining
+    assert {'recent', 'stream_end:msg-2'} <= remaining
+
+
+async def test_hanging_category_lookup_does_not_stall_the_journal(db, journal, bot, monkeypatch):
+    async def hanging_channel(broadcaster):
+        await asyncio.sleep(60)
+    monkeypatch.setattr(bot, 'fetch_channel', hanging_channel)
+    monkeypatch.setattr(bot_module, 'channel_lookup_timeout', 0.1)
+
+    started_at = datetime(2024, 6, 1, 18, 0, tzinfo=timezone.utc)
+    await journal.append('stream_start', 'stream-hang-1', 4713, 'teststreamer', started_at)
+    assert await asyncio.wait_for(bot.flush_stream_event_batch(), timeout=5)
+
+    session = await db.fetchrow("SELECT session_id FROM stream_game_segments WHERE channel_id = 4713")
+    assert session is not None
+    assert await _drained(journal)
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+import bot as bot_module
+
+
+@pytest.fixture
+def sullygnome_limiter(monkeypatch):
+    limiter = bot_module.CommandLimiter('sullygnome', 1)
+    monkeypatch.setitem(bot_module.command_limiters, 'sullygnome', limiter)
+    monkeypatch.setattr(bot_module, 'sullygnome_backfill', True)
+    return limiter
+
+
+async def no_mods(channel_name):
+    return []
+
+
+async def test_update_checks_permission_before_taking_a_slot(bot, sullygnome_limiter, make_ctx, monkeypatch):
+    monkeypatch.setattr(bot, 'get_mods', no_mods)
+    sullygnome_limiter.active = 1
+    sullygnome_limiter.service_time = 3600
+
+    ctx = make_ctx('viewer', command='update')
+    await bot_module.Bot.update_offdays._callback(bot, ctx, 'testchannel')
+
+    assert ctx.replies == ["/me ❌ Nur der Streamer und die Moderatoren können diesen Command ausführen."]
+    assert sullygnome_limiter.shed == 0
+    assert sullygnome_limiter.admitted == 0
+
+
+async def test_update_holds_slot_only_for_the_sullygnome_fetch(bot, sullygnome_limiter, make_ctx, monkeypatch):
+    async def mods(channel_name):
+        return ['moderator']
+
+    seen_active = []
+
+    async def streams(channel_name):
+        seen_active.append(sullygnome_limiter.active)
+        return [{'startDateTime': '2024-05-01T18:00:00Z'}, {'startDateTime': '2024-05-02T18:00:00Z'}]
+
+    async def store(channel_name, live_days_per_month):
+        seen_active.append(sullygnome_limiter.active)
+        assert dict(live_days_per_month) == {(2024, 5): 2}
+
+    monkeypatch.setattr(bot, 'get_mods', mods)
+    monkeypatch.setattr(bot, 'sullygnome_streams', streams)
+    monkeypatch.setattr(bot, 'update_offdays_in_db', store)
+
+    ctx = make_ctx('moderator', command='update')
+    await bot_module.Bot.update_offdays._callback(bot, ctx, 'testchannel')
+
+    assert seen_active == [1, 0]
+    assert sullygnome_limiter.active == 0
+    assert ctx.replies[-1].startswith('/me ✅')
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def queue_up(limiter, requests, admitted):
+    """Stellt Anfragen (channel, priority, name) in die Warteschlange; zugelassene Namen landen in admitted."""
+    async def request(channel, priority, name):
+        if await limiter.acquire(channel, priority):
+            admitted.append(name)
+
+    tasks = []
+    for channel, priority, name in requests:
+        tasks.append(asyncio.create_task(request(channel, priority, name)))
+        await settle()
+    return tasks
+
+
+async def test_waiters_are_served_round_robin_per_channel():
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+    admitted = []
+    tasks = await queue_up(limiter, [('a', False, 'a1'), ('a', False, 'a2'), ('a', False, 'a3'), ('b', False, 'b1')], admitted)
+
+    for _ in tasks:
+        limiter.release(0.0)
+        await settle()
+
+    assert admitted == ['a1', 'b1', 'a2', 'a3']
+    assert limiter.active == 1 and limiter.queued() == 0
+
+
+async def test_priority_lane_is_served_first():
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+    admitted = []
+    tasks = await queue_up(limiter, [('a', False, 'viewer'), ('b', True, 'mod')], admitted)
+
+    for _ in tasks:
+        limiter.release(0.0)
+        await settle()
+
+    assert admitted == ['mod', 'viewer']
+
+
+async def test_sheds_when_estimated_wait_is_too_long():
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+    limiter.service_time = bot_module.limiter_max_wait * 2
+
+    assert await limiter.acquire('b', False) is False
+    assert limiter.shed == 1 and limiter.queued() == 0
+
+
+async def test_sheds_waiters_that_time_out(monkeypatch):
+    monkeypatch.setattr(bot_module, 'limiter_max_wait', 0.05)
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+
+    assert await limiter.acquire('b', False) is False
+    assert limiter.shed == 1 and limiter.queued() == 0
+    limiter.release(0.0)
+    assert limiter.active == 0
+
+
+async def test_waiter_cancelled_after_grant_passes_the_slot_on():
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+    admitted = []
+    first, second = await queue_up(limiter, [('a', False, 'first'), ('b', False, 'second')], admitted)
+
+    # Platz an first vergeben, first aber abbrechen, bevor es wieder läuft.
+    limiter.release(0.0)
+    first.cancel()
+    await settle()
+
+    assert first.cancelled()
+    assert admitted == ['second']
+    assert limiter.active == 1
+    limiter.release(0.0)
+    assert limiter.active == 0
+    await second
+
+
+async def test_waiter_cancelled_while_queued_leaves_the_queue():
+    limiter = bot_module.CommandLimiter('test', 1)
+    assert await limiter.acquire('a', False)
+    [waiting] = await queue_up(limiter, [('b', False, 'waiting')], [])
+
+    waiting.cancel()
+    await settle()
+
+    assert waiting.cancelled()
+    assert limiter.queued() == 0 and not limiter.lanes[False]
+    limiter.release(0.0)
+    assert limiter.active == 0
@@ -0,0 +1,60 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+import pytest
+
+import bot as bot_module
+
+
+@pytest.fixture
+def json_log():
+    """Hängt die Queue/JSON-Pipeline aus bot.py an den Logger 'bot' und liefert ihre Ausgabe."""
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(bot_module.JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    queue_handler = bot_module.StructuredQueueHandler(log_queue)
+    bot_module.logger.addHandler(queue_handler)
+    listener.start()
+
+    def lines():
+        listener.stop()
+        return output.getvalue().splitlines()
+
+    yield lines
+    bot_module.logger.removeHandler(queue_handler)
+
+
+def test_record_with_context_is_one_json_line(json_log):
+    try:
+        raise ValueError('mehrzeilig\nkaputt')
+    except ValueError:
+        bot_module.logger.error('Anfrage fehlgeschlagen', exc_info=True,
+                                extra={'channel': 'testchannel', 'command': 'logs', 'latency_ms': 123})
+
+    [line] = json_log()
+    entry = json.loads(line)
+    assert entry['msg'] == 'Anfrage fehlgeschlagen'
+    assert (entry['channel'], entry['command'], entry['latency_ms']) == ('testchannel', 'logs', 123)
+    assert 'ValueError: mehrzeilig' in entry['exc']
+
+
+async def test_command_errors_are_logged_instead_of_printed(bot, make_ctx, json_log, capsys):
+    ctx = make_ctx('viewer', command='offdays')
+    try:
+        raise KeyError('offdays')
+    except KeyError as e:
+        error = e
+
+    await bot.event_command_error(ctx, error)
+
+    [line] = json_log()
+    entry = json.loads(line)
+    assert entry['level'] == 'ERROR'
+    assert (entry['channel'], entry['command']) == ('testchannel', 'offdays')
+    assert 'KeyError' in entry['exc']
+    assert capsys.readouterr().err == ''
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import bot as bot_module
+
+
+async def busy_worker(stop):
+    while not stop.is_set():
+        deadline = time.perf_counter() + 0.02
+        while time.perf_counter() < deadline:
+            pass
+        await asyncio.sleep(0)
+
+
+async def sleeping_worker(stop):
+    while not stop.is_set():
+        await asyncio.sleep(0.05)
+
+
+async def test_profile_reports_run_time_not_wall_time(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_module, 'profile_dir', str(tmp_path))
+    stop = asyncio.Event()
+    workers = [asyncio.create_task(busy_worker(stop)), asyncio.create_task(sleeping_worker(stop))]
+    try:
+        path, hotspots, task_times, idle_share = await bot.profile_runtime(1)
+    finally:
+        stop.set()
+        await asyncio.gather(*workers)
+
+    times = dict(task_times)
+    assert times['busy_worker'] > 0.5
+    assert times['sleeping_worker'] < 0.05
+    assert (tmp_path / (path.rsplit('/', 1)[-1] + '.prof')).exists()
+
+
+async def test_profile_sees_tasks_started_while_profiling(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_module, 'profile_dir', str(tmp_path))
+
+    async def short_command():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    async def start_later():
+        await asyncio.sleep(0.2)
+        await asyncio.create_task(short_command())
+
+    starter = asyncio.create_task(start_later())
+    _, _, task_times, _ = await bot.profile_runtime(1)
+    await starter
+
+    assert dict(task_times)['test_profile_sees_tasks_started_while_profiling.<locals>.short_command'] >= 0.04
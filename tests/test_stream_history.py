@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import bot as bot_module
+
+
+async def add_session(db, channel_id, stream_id, started_at, hours, category):
+    session_id = await db.fetchval(
+        "INSERT INTO stream_sessions (channel_id, stream_id, started_at, ended_at) VALUES ($1, $2, $3, $4) RETURNING id",
+        channel_id, stream_id, started_at, started_at + timedelta(hours=hours)
+    )
+    await db.execute(
+        "INSERT INTO stream_game_segments (session_id, channel_id, category_name, started_at, ended_at) VALUES ($1, $2, $3, $4, $5)",
+        session_id, channel_id, category, started_at, started_at + timedelta(hours=hours)
+    )
+
+
+async def test_local_most_played_reports_partial_coverage(db, bot):
+    now = datetime.now(timezone.utc)
+    await add_session(db, 1001, 'partial-1', now - timedelta(days=10), 3, 'Minecraft')
+
+    games, covered = await bot.local_most_played(db, 1001)
+    assert [game[0] for game in games] == ['Minecraft']
+    assert not covered
+
+
+async def test_local_most_played_covers_full_year(db, bot):
+    now = datetime.now(timezone.utc)
+    await add_session(db, 1002, 'full-1', now - timedelta(days=400), 2, 'Tetris')
+    await add_session(db, 1002, 'full-2', now - timedelta(days=5), 3, 'Minecraft')
+    await add_session(db, 1002, 'full-3', now - timedelta(days=4), 1, 'Tetris')
+
+    games, covered = await bot.local_most_played(db, 1002)
+    assert covered
+    assert games[0][0] == 'Minecraft'
+    assert games[0][1] == 180
+    assert games[1] == ('Tetris', 60, 240)
+
+
+async def test_mostplayed_falls_back_to_sullygnome_without_postgres(bot, make_ctx, monkeypatch, unused_tcp_port):
+    monkeypatch.setenv('db_host_ip', '127.0.0.1')
+    monkeypatch.setenv('db_port', str(unused_tcp_port))
+    monkeypatch.setattr(bot_module, 'sullygnome_backfill', True)
+
+    async def fetch_users(names):
+        return [SimpleNamespace(id=1003, display_name='Teststreamer')]
+
+    async def sullygnome(streamer_name):
+        return 'Teststreamer', [('Tetris', 120, 240), ('Minecraft', 120, 240)]
+
+    monkeypatch.setattr(bot, 'fetch_users', fetch_users)
+    monkeypatch.setattr(bot, 'sullygnome_most_played', sullygnome)
+
+    ctx = make_ctx('viewer', command='mostplayed')
+    await bot_module.Bot.mostplayed._callback(bot, ctx, 'teststreamer', 2)
+
+    assert ctx.replies == ['/me ✅ Teststreamer: 1. 2 Stunden (50%) Tetris | 2. 2 Stunden (50%) Minecraft']
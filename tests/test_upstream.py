@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+import bot as bot_module
+
+
+@pytest.fixture
+async def upstream(unused_tcp_port_factory):
+    async def broken_text(request):
+        return web.Response(body=b'\xff\xfe kaputt', content_type='text/plain', charset='utf-8')
+
+    async def ok(request):
+        return web.Response(text='ok')
+
+    async def silent(request):
+        await asyncio.sleep(2)
+        return web.json_response({'channels': []})
+
+    app = web.Application()
+    app.router.add_get('/broken', broken_text)
+    app.router.add_get('/ok', ok)
+    app.router.add_get('/silent/channels', silent)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = unused_tcp_port_factory()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    yield f'http://127.0.0.1:{port}'
+    await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(bot_module, 'circuit_breakers', {})
+
+
+async def test_undecodable_body_counts_as_failure(upstream):
+    with pytest.raises(bot_module.UpstreamUnavailable):
+        await bot_module.upstream_request('GET', f'{upstream}/broken')
+    breaker = bot_module.get_breaker(upstream)
+    assert breaker.failures == 1
+    assert not breaker.probe_in_flight
+
+
+async def test_failed_probe_does_not_wedge_half_open_breaker(upstream):
+    breaker = bot_module.get_breaker(upstream)
+    breaker.state = 'open'
+    breaker.opened_at = 0.0
+
+    with pytest.raises(bot_module.UpstreamUnavailable):
+        await bot_module.upstream_request('GET', f'{upstream}/broken')
+    assert breaker.state == 'open'
+    assert not breaker.probe_in_flight
+
+    breaker.opened_at = 0.0
+    status, body = await bot_module.upstream_request('GET', f'{upstream}/ok')
+    assert (status, body) == (200, 'ok')
+    assert breaker.state == 'closed'
+
+
+async def test_log_instance_that_misses_the_reply_budget_still_trips_its_breaker(upstream, bot, monkeypatch):
+    monkeypatch.setattr(bot_module, 'log_sites', [f'{upstream}/silent'])
+    monkeypatch.setattr(bot_module, 'logs_reply_budget', 0.1)
+    monkeypatch.setattr(bot_module, 'upstream_max_deadline', 0.5)
+
+    start = time.monotonic()
+    assert await bot.search_logs('testchannel') == []
+    assert time.monotonic() - start < 0.4
+
+    # Die Antwort ist schon raus, die Anfrage läuft aber bis zur Deadline weiter und zählt dann als Fehler.
+    await asyncio.gather(*bot_module.background_tasks)
+    assert bot_module.get_breaker(upstream).failures == 1